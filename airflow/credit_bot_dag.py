@@ -11,9 +11,32 @@ Repository: https://github.com/twilio-internal/credits-automation
 
 from datetime import datetime, timedelta
 from airflow import DAG
+from airflow.models import Pool
 from airflow.providers.cncf.kubernetes.operators.pod import KubernetesPodOperator
 from airflow.kubernetes.secret import Secret
 
+# Ensure the looker_api pool exists: a task referencing a nonexistent pool
+# is never scheduled (it sits queued forever), so relying on someone
+# creating it by hand in the UI would silently halt the DAG. Guarded so
+# parsing still succeeds if the metadata DB is momentarily unwritable.
+try:
+    try:
+        Pool.create_or_update_pool(
+            name='looker_api',
+            slots=4,
+            description='Caps concurrent tasks hitting the Looker API',
+            include_deferred=False,
+        )
+    except TypeError:
+        # Airflow < 2.7 has no include_deferred parameter
+        Pool.create_or_update_pool(
+            name='looker_api',
+            slots=4,
+            description='Caps concurrent tasks hitting the Looker API',
+        )
+except Exception:
+    pass
+
 # Default arguments for the DAG
 default_args = {
     'owner': 'team_accsec-ai',
@@ -23,6 +46,11 @@ default_args = {
     'email_on_retry': False,
     'retries': 2,
     'retry_delay': timedelta(minutes=5),
+    # Back off exponentially on retry (5min, then capped at 8min) so transient
+    # 429s from Slack/Looker/AWS get recovery time without blowing the
+    # 10-minute execution_timeout
+    'retry_exponential_backoff': True,
+    'max_retry_delay': timedelta(minutes=8),
     'execution_timeout': timedelta(minutes=10),
 }
 
@@ -49,10 +77,20 @@ aws_secret = Secret(
 # Define the Kubernetes Pod Operator
 process_credit_requests = KubernetesPodOperator(
     task_id='process_credit_requests',
+
+    # Run under the looker_api pool (created at parse time above) so any
+    # future per-message fan-out is capped before it can hammer the
+    # Looker API or Secrets Manager concurrently
+    pool='looker_api',
+    pool_slots=1,
+
     name='credit-bot-{{ ts_nodash | lower }}',  # Pod name with timestamp
     namespace='accsec-ai',  # Kubernetes namespace (adjust as needed)
-    image='<ECR_REPOSITORY_URL>/accsec-ai/credit-bot:latest',  # Replace with actual ECR URL
-    image_pull_policy='Always',  # Always pull latest image
+    # Pin by immutable digest (CI templates the digest in at deploy time) so
+    # the kubelet's layer cache is valid across runs; IfNotPresent then skips
+    # the ECR pull entirely once a node has the image
+    image='<ECR_REPOSITORY_URL>/accsec-ai/credit-bot@sha256:<IMAGE_DIGEST>',
+    image_pull_policy='IfNotPresent',
 
     # Secrets and environment variables
     secrets=[aws_secret],
@@ -136,11 +174,11 @@ Click the "Play" button in Airflow UI to run immediately.
 
 """
 
-# You can add additional tasks here, such as:
-# - Pre-execution health checks
-# - Post-execution notifications
-# - Metric collection
-# - Data quality checks
+# Keep the DAG a single pod: each extra KubernetesPodOperator task pays its
+# own pod cold-start (up to startup_timeout_seconds) and loads the control
+# plane. Pre-checks, notifications, metric collection etc. belong in-process —
+# see _run_pre_checks/_run_post_hooks in src/credit_bot.py. Future parallelism
+# should use in-pod concurrent.futures/asyncio, not additional pods.
 
 # Example of adding a Slack notification on failure (optional):
 # from airflow.providers.slack.operators.slack_webhook import SlackWebhookOperator
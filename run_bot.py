@@ -7,6 +7,7 @@ Runs the credit automation bot with production-ready features
 import sys
 import signal
 import logging
+
 from src.credit_bot import main
 
 logger = logging.getLogger(__name__)
@@ -3,9 +3,13 @@ AWS Integration Module
 Provides utilities for AWS Secrets Manager and S3 operations
 """
 
+import codecs
+import gzip
+import io
 import json
 import logging
 import os
+from functools import lru_cache
 from typing import Dict, Optional, Any
 from pathlib import Path
 
@@ -14,12 +18,87 @@ logger = logging.getLogger(__name__)
 # Try to import boto3, but don't fail if not available (for local development)
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
     from botocore.exceptions import ClientError, NoCredentialsError
     BOTO3_AVAILABLE = True
+
+    # Adaptive retries back off on throttling instead of stampeding, and a
+    # larger pool lets concurrent S3 work reuse warm TLS connections; TCP
+    # keepalive stops idle pooled connections being silently dropped between
+    # bursts, which would force a fresh ~40-100ms TLS handshake per PUT
+    _BOTO_CONFIG = BotoConfig(
+        retries={'mode': 'adaptive', 'max_attempts': 5},
+        max_pool_connections=20,
+        tcp_keepalive=True
+    )
+
+    # S3 bodies travel over TLS and get server-side checksums, so skipping the
+    # client-side SHA256 payload signature saves a full hash pass per upload;
+    # virtual-hosted addressing keeps request URLs on the bucket's own endpoint
+    _S3_CONFIG = _BOTO_CONFIG.merge(BotoConfig(
+        signature_version='s3v4',
+        s3={'addressing_style': 'virtual', 'payload_signing_enabled': False}
+    ))
+
+    # Shared transfer tuning: small objects still go out as a single PUT, but
+    # anything past 8MB (notebook HTML renders, images) is split into parallel
+    # multipart chunks
+    _XFER_CONFIG = TransferConfig(
+        multipart_threshold=8 * 1024 * 1024,
+        multipart_chunksize=8 * 1024 * 1024,
+        max_concurrency=10,
+        use_threads=True
+    )
 except ImportError:
     BOTO3_AVAILABLE = False
     logger.warning("boto3 not available - AWS features disabled")
 
+# Prefer orjson for state-sized JSON blobs (~3-10x faster than stdlib);
+# fall back silently so local environments without the wheel still work
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional async S3 support (only needed by AWSIntegrationAsync)
+try:
+    import aioboto3
+    AIOBOTO3_AVAILABLE = True
+except ImportError:
+    AIOBOTO3_AVAILABLE = False
+
+# Optional client-side cache for Secrets Manager (avoids a GetSecretValue
+# round-trip per property access; the pod runs every 15 minutes so a 15-minute
+# refresh interval means at most one fetch per run)
+try:
+    from aws_secretsmanager_caching import SecretCache, SecretCacheConfig
+    SECRET_CACHE_AVAILABLE = True
+except ImportError:
+    SECRET_CACHE_AVAILABLE = False
+
+# How long cached secrets stay fresh before the cache refreshes (seconds)
+SECRET_REFRESH_INTERVAL = 900
+
+# Client creation costs ~100ms (credential chain resolution + service model
+# loading), so share one Session and cache clients per (service, region)
+_session = None
+_CLIENT_CACHE: Dict[tuple, Any] = {}
+
+
+def _get_client(service_name: str, region_name: str):
+    """Get or create a cached boto3 client for a service/region pair"""
+    global _session
+    key = (service_name, region_name)
+    if key not in _CLIENT_CACHE:
+        if _session is None:
+            _session = boto3.session.Session()
+        config = _S3_CONFIG if service_name == 's3' else _BOTO_CONFIG
+        _CLIENT_CACHE[key] = _session.client(service_name, region_name=region_name,
+                                             config=config)
+    return _CLIENT_CACHE[key]
+
 
 class AWSIntegration:
     """Handles AWS Secrets Manager and S3 operations"""
@@ -34,14 +113,25 @@ class AWSIntegration:
         self.region_name = region_name
         self.secrets_client = None
         self.s3_client = None
+        self._secret_cache = None
 
         if BOTO3_AVAILABLE:
             try:
-                self.secrets_client = boto3.client('secretsmanager', region_name=region_name)
-                self.s3_client = boto3.client('s3', region_name=region_name)
-                logger.info(f"AWS clients initialized for region {region_name}")
+                self.secrets_client = _get_client('secretsmanager', region_name)
+                self.s3_client = _get_client('s3', region_name)
+                logger.info("AWS clients initialized for region %s", region_name)
             except Exception as e:
-                logger.warning(f"Could not initialize AWS clients: {e}")
+                logger.warning("Could not initialize AWS clients: %s", e)
+
+        if SECRET_CACHE_AVAILABLE and self.secrets_client:
+            try:
+                self._secret_cache = SecretCache(
+                    config=SecretCacheConfig(secret_refresh_interval=SECRET_REFRESH_INTERVAL),
+                    client=self.secrets_client
+                )
+                logger.info("Secrets Manager client-side cache enabled")
+            except Exception as e:
+                logger.warning("Could not initialize secrets cache: %s", e)
 
     def fetch_secrets(self, secret_name: str) -> Optional[Dict[str, str]]:
         """
@@ -58,31 +148,37 @@ class AWSIntegration:
             return None
 
         try:
-            response = self.secrets_client.get_secret_value(SecretId=secret_name)
-
-            # Secrets can be stored as string or binary
-            if 'SecretString' in response:
-                secret_data = json.loads(response['SecretString'])
-                logger.info(f"Successfully fetched secrets from {secret_name}")
-                return secret_data
+            # Prefer the TTL-bounded local cache: repeated fetches within the
+            # refresh interval never leave the process
+            if self._secret_cache:
+                secret_string = self._secret_cache.get_secret_string(secret_name)
             else:
-                logger.error(f"Secret {secret_name} not in expected format")
-                return None
+                response = self.secrets_client.get_secret_value(SecretId=secret_name)
+
+                # Secrets can be stored as string or binary
+                if 'SecretString' not in response:
+                    logger.error("Secret %s not in expected format", secret_name)
+                    return None
+                secret_string = response['SecretString']
+
+            secret_data = json.loads(secret_string)
+            logger.info("Successfully fetched secrets from %s", secret_name)
+            return secret_data
 
         except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'ResourceNotFoundException':
-                logger.error(f"Secret {secret_name} not found")
+                logger.error("Secret %s not found", secret_name)
             elif error_code == 'AccessDeniedException':
-                logger.error(f"Access denied to secret {secret_name}")
+                logger.error("Access denied to secret %s", secret_name)
             else:
-                logger.error(f"Error fetching secret {secret_name}: {e}")
+                logger.error("Error fetching secret %s: %s", secret_name, e)
             return None
         except NoCredentialsError:
             logger.error("AWS credentials not configured")
             return None
         except Exception as e:
-            logger.error(f"Unexpected error fetching secrets: {e}")
+            logger.error("Unexpected error fetching secrets: %s", e)
             return None
 
     def read_from_s3(self, bucket: str, key: str) -> Optional[str]:
@@ -102,29 +198,157 @@ class AWSIntegration:
 
         try:
             response = self.s3_client.get_object(Bucket=bucket, Key=key)
-            content = response['Body'].read().decode('utf-8')
-            logger.info(f"Successfully read s3://{bucket}/{key}")
+            chunks = response['Body'].iter_chunks(chunk_size=1 << 20)
+            first = next(chunks, b'')
+
+            # Transparently decompress objects written with compress=True
+            # (needs the whole buffer, so fall back to a one-shot read)
+            if response.get('ContentEncoding') == 'gzip' or first[:2] == b'\x1f\x8b':
+                content = gzip.decompress(first + b''.join(chunks)).decode('utf-8')
+            else:
+                # Stream-decode 1MB chunks instead of materializing the full
+                # byte buffer plus a second str copy - halves peak memory on
+                # multi-MB notebook HTML outputs
+                decoder = codecs.getincrementaldecoder('utf-8')()
+                parts = [decoder.decode(first)]
+                parts.extend(decoder.decode(chunk) for chunk in chunks)
+                parts.append(decoder.decode(b'', final=True))
+                content = ''.join(parts)
+
+            logger.info("Successfully read s3://%s/%s", bucket, key)
             return content
         except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'NoSuchKey':
-                logger.warning(f"File not found in S3: s3://{bucket}/{key}")
+                logger.warning("File not found in S3: s3://%s/%s", bucket, key)
+            else:
+                logger.error("Error reading from S3: %s", e)
+            return None
+        except Exception as e:
+            logger.error("Unexpected error reading from S3: %s", e)
+            return None
+
+    def read_from_s3_if_changed(self, bucket: str, key: str,
+                                etag: str = None) -> tuple:
+        """
+        Read a file from S3 only if it changed since the given ETag
+
+        Sends a conditional GET (If-None-Match); when the object still
+        matches, S3 answers 304 with no body, so unchanged state never
+        crosses the wire.
+
+        Args:
+            bucket: S3 bucket name
+            key: S3 object key (path)
+            etag: Last-seen ETag, or None for an unconditional read
+
+        Returns:
+            (content, etag) tuple. content is None and etag echoes the input
+            on a 304 (unchanged); both are None on error or missing key.
+        """
+        if not self.s3_client:
+            logger.warning("S3 client not available")
+            return None, None
+
+        try:
+            kwargs = {'Bucket': bucket, 'Key': key}
+            if etag:
+                kwargs['IfNoneMatch'] = etag
+            response = self.s3_client.get_object(**kwargs)
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status == 304:
+                logger.info("s3://%s/%s unchanged (ETag match)", bucket, key)
+                return None, etag
+            error_code = e.response['Error']['Code']
+            if error_code == 'NoSuchKey':
+                logger.warning("File not found in S3: s3://%s/%s", bucket, key)
+            else:
+                logger.error("Error reading from S3: %s", e)
+            return None, None
+        except Exception as e:
+            logger.error("Unexpected error reading from S3: %s", e)
+            return None, None
+
+        body = response['Body'].read()
+        if response.get('ContentEncoding') == 'gzip' or body[:2] == b'\x1f\x8b':
+            body = gzip.decompress(body)
+        logger.info("Successfully read s3://%s/%s", bucket, key)
+        return body.decode('utf-8'), response.get('ETag')
+
+    def get_etag(self, bucket: str, key: str) -> Optional[str]:
+        """
+        Fetch an object's current ETag via HEAD (no body transfer)
+
+        Args:
+            bucket: S3 bucket name
+            key: S3 object key (path)
+
+        Returns:
+            ETag string, or None if not available
+        """
+        if not self.s3_client:
+            return None
+
+        try:
+            response = self.s3_client.head_object(Bucket=bucket, Key=key)
+            return response.get('ETag')
+        except ClientError as e:
+            logger.debug("Could not fetch ETag for s3://%s/%s: %s", bucket, key, e)
+            return None
+        except Exception as e:
+            logger.debug("Unexpected error fetching ETag: %s", e)
+            return None
+
+    def read_bytes_from_s3(self, bucket: str, key: str) -> Optional[bytes]:
+        """
+        Read a file from S3 as raw bytes (no UTF-8 decode)
+
+        For callers that only need bytes (e.g. binary payloads or JSON parsers
+        that accept bytes directly), this skips the str conversion entirely.
+
+        Args:
+            bucket: S3 bucket name
+            key: S3 object key (path)
+
+        Returns:
+            File contents as bytes, or None if not available
+        """
+        if not self.s3_client:
+            logger.warning("S3 client not available")
+            return None
+
+        try:
+            response = self.s3_client.get_object(Bucket=bucket, Key=key)
+            body = response['Body'].read()
+            if response.get('ContentEncoding') == 'gzip' or body[:2] == b'\x1f\x8b':
+                body = gzip.decompress(body)
+            logger.info("Successfully read s3://%s/%s", bucket, key)
+            return body
+        except ClientError as e:
+            error_code = e.response['Error']['Code']
+            if error_code == 'NoSuchKey':
+                logger.warning("File not found in S3: s3://%s/%s", bucket, key)
             else:
-                logger.error(f"Error reading from S3: {e}")
+                logger.error("Error reading from S3: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error reading from S3: {e}")
+            logger.error("Unexpected error reading from S3: %s", e)
             return None
 
-    def write_to_s3(self, bucket: str, key: str, content: str, content_type: str = 'text/plain') -> bool:
+    def write_to_s3(self, bucket: str, key: str, content: str, content_type: str = 'text/plain',
+                    compress: bool = False) -> bool:
         """
         Write a file to S3
 
         Args:
             bucket: S3 bucket name
             key: S3 object key (path)
-            content: Content to write
+            content: Content to write (str, or bytes already encoded -
+                     callers sharing one serialized buffer skip a copy)
             content_type: MIME type of content
+            compress: gzip the payload before upload (JSON state compresses
+                      ~8-10x, cutting PUT bytes and later GET latency)
 
         Returns:
             True if successful, False otherwise
@@ -134,21 +358,79 @@ class AWSIntegration:
             return False
 
         try:
-            self.s3_client.put_object(
-                Bucket=bucket,
-                Key=key,
-                Body=content.encode('utf-8'),
-                ContentType=content_type
+            body = content if isinstance(content, bytes) else content.encode('utf-8')
+            extra_args = {'ContentType': content_type}
+            if compress:
+                body = gzip.compress(body)
+                extra_args['ContentEncoding'] = 'gzip'
+
+            self.s3_client.upload_fileobj(
+                io.BytesIO(body),
+                bucket,
+                key,
+                ExtraArgs=extra_args,
+                Config=_XFER_CONFIG
             )
-            logger.info(f"Successfully wrote s3://{bucket}/{key}")
+            logger.info("Successfully wrote s3://%s/%s", bucket, key)
             return True
         except ClientError as e:
-            logger.error(f"Error writing to S3: {e}")
+            logger.error("Error writing to S3: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error writing to S3: {e}")
+            logger.error("Unexpected error writing to S3: %s", e)
+            return False
+
+    def read_json_from_s3(self, bucket: str, key: str) -> Optional[Any]:
+        """
+        Read and deserialize a JSON object from S3
+
+        Uses orjson when available (the state blob is re-parsed every 15
+        minutes, so the ~3-10x decode speedup is worth taking).
+
+        Args:
+            bucket: S3 bucket name
+            key: S3 object key (path)
+
+        Returns:
+            Deserialized object, or None if not available
+        """
+        content = self.read_from_s3(bucket, key)
+        if content is None:
+            return None
+
+        try:
+            if ORJSON_AVAILABLE:
+                return orjson.loads(content)
+            return json.loads(content)
+        except (ValueError, TypeError) as e:
+            logger.error("Invalid JSON in s3://%s/%s: %s", bucket, key, e)
+            return None
+
+    def write_json_to_s3(self, bucket: str, key: str, obj: Any, compress: bool = False) -> bool:
+        """
+        Serialize an object to JSON and write it to S3
+
+        Args:
+            bucket: S3 bucket name
+            key: S3 object key (path)
+            obj: JSON-serializable object
+            compress: gzip the payload before upload
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            if ORJSON_AVAILABLE:
+                content = orjson.dumps(obj, default=str).decode('utf-8')
+            else:
+                content = json.dumps(obj, default=str)
+        except (ValueError, TypeError) as e:
+            logger.error("Could not serialize object for s3://%s/%s: %s", bucket, key, e)
             return False
 
+        return self.write_to_s3(bucket, key, content,
+                                content_type='application/json', compress=compress)
+
     def upload_file_to_s3(self, bucket: str, key: str, file_path: Path) -> bool:
         """
         Upload a local file to S3
@@ -166,18 +448,18 @@ class AWSIntegration:
             return False
 
         if not file_path.exists():
-            logger.error(f"File not found: {file_path}")
+            logger.error("File not found: %s", file_path)
             return False
 
         try:
-            self.s3_client.upload_file(str(file_path), bucket, key)
-            logger.info(f"Successfully uploaded {file_path} to s3://{bucket}/{key}")
+            self.s3_client.upload_file(str(file_path), bucket, key, Config=_XFER_CONFIG)
+            logger.info("Successfully uploaded %s to s3://%s/%s", file_path, bucket, key)
             return True
         except ClientError as e:
-            logger.error(f"Error uploading file to S3: {e}")
+            logger.error("Error uploading file to S3: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error uploading to S3: {e}")
+            logger.error("Unexpected error uploading to S3: %s", e)
             return False
 
     def download_file_from_s3(self, bucket: str, key: str, file_path: Path) -> bool:
@@ -200,20 +482,55 @@ class AWSIntegration:
             # Ensure parent directory exists
             file_path.parent.mkdir(parents=True, exist_ok=True)
 
-            self.s3_client.download_file(bucket, key, str(file_path))
-            logger.info(f"Successfully downloaded s3://{bucket}/{key} to {file_path}")
+            self.s3_client.download_file(bucket, key, str(file_path), Config=_XFER_CONFIG)
+            logger.info("Successfully downloaded s3://%s/%s to %s", bucket, key, file_path)
             return True
         except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'NoSuchKey':
-                logger.warning(f"File not found in S3: s3://{bucket}/{key}")
+                logger.warning("File not found in S3: s3://%s/%s", bucket, key)
             else:
-                logger.error(f"Error downloading from S3: {e}")
+                logger.error("Error downloading from S3: %s", e)
             return False
         except Exception as e:
-            logger.error(f"Unexpected error downloading from S3: {e}")
+            logger.error("Unexpected error downloading from S3: %s", e)
             return False
 
+    def list_keys(self, bucket: str, prefix: str = '') -> set:
+        """
+        List all object keys under a prefix in a single paginated scan
+
+        Prefer this over per-key file_exists_in_s3 calls when checking many
+        keys: one ListObjectsV2 round-trip per 1000 keys instead of one HEAD
+        per key, then O(1) membership tests against the returned set.
+
+        Args:
+            bucket: S3 bucket name
+            prefix: Key prefix to scan (empty for whole bucket)
+
+        Returns:
+            Set of object keys, empty set if not available
+        """
+        if not self.s3_client:
+            logger.warning("S3 client not available")
+            return set()
+
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            keys = {
+                obj['Key']
+                for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get('Contents', [])
+            }
+            logger.info("Listed %s keys under s3://%s/%s", len(keys), bucket, prefix)
+            return keys
+        except ClientError as e:
+            logger.error("Error listing S3 keys: %s", e)
+            return set()
+        except Exception as e:
+            logger.error("Unexpected error listing S3 keys: %s", e)
+            return set()
+
     def file_exists_in_s3(self, bucket: str, key: str) -> bool:
         """
         Check if a file exists in S3
@@ -235,17 +552,85 @@ class AWSIntegration:
             error_code = e.response['Error']['Code']
             if error_code == '404':
                 return False
-            logger.error(f"Error checking S3 file existence: {e}")
+            logger.error("Error checking S3 file existence: %s", e)
+            return False
+        except Exception as e:
+            logger.error("Unexpected error checking S3: %s", e)
+            return False
+
+
+class AWSIntegrationAsync:
+    """
+    Async S3 operations via aioboto3
+
+    Companion to AWSIntegration for batch phases where many independent S3
+    round-trips (~50ms each) would otherwise serialize: gather N coroutines
+    and pay max-latency instead of sum-of-latencies. The sync class remains
+    the default for single-shot calls.
+    """
+
+    def __init__(self, region_name: str = 'us-east-1'):
+        """
+        Initialize async AWS integration
+
+        Args:
+            region_name: AWS region (default: us-east-1 for N. Virginia)
+        """
+        self.region_name = region_name
+        self._session = aioboto3.Session() if AIOBOTO3_AVAILABLE else None
+        if not AIOBOTO3_AVAILABLE:
+            logger.warning("aioboto3 not available - async AWS features disabled")
+
+    async def list_keys(self, bucket: str, prefix: str = '') -> set:
+        """Async version of AWSIntegration.list_keys"""
+        if not self._session:
+            return set()
+        try:
+            async with self._session.client('s3', region_name=self.region_name) as s3:
+                paginator = s3.get_paginator('list_objects_v2')
+                keys = set()
+                async for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+                    keys.update(obj['Key'] for obj in page.get('Contents', []))
+                return keys
+        except Exception as e:
+            logger.error("Error listing S3 keys (async): %s", e)
+            return set()
+
+    async def get_object(self, bucket: str, key: str) -> Optional[bytes]:
+        """Fetch an object body, or None if not available"""
+        if not self._session:
+            return None
+        try:
+            async with self._session.client('s3', region_name=self.region_name) as s3:
+                response = await s3.get_object(Bucket=bucket, Key=key)
+                return await response['Body'].read()
+        except Exception as e:
+            logger.error("Error reading s3://%s/%s (async): %s", bucket, key, e)
+            return None
+
+    async def put_object(self, bucket: str, key: str, body: bytes,
+                         content_type: str = 'text/plain') -> bool:
+        """Write an object, returning True on success"""
+        if not self._session:
             return False
+        try:
+            async with self._session.client('s3', region_name=self.region_name) as s3:
+                await s3.put_object(Bucket=bucket, Key=key, Body=body,
+                                    ContentType=content_type)
+                return True
         except Exception as e:
-            logger.error(f"Unexpected error checking S3: {e}")
+            logger.error("Error writing s3://%s/%s (async): %s", bucket, key, e)
             return False
 
 
+@lru_cache(maxsize=1)
 def is_running_in_airflow() -> bool:
     """
     Detect if code is running in Airflow environment
 
+    Cached for the process lifetime - the environment can't change underneath
+    us and this saves repeated os.getenv scans.
+
     Returns:
         True if running in Airflow, False otherwise
     """
@@ -254,6 +639,7 @@ def is_running_in_airflow() -> bool:
     return any(os.getenv(var) for var in airflow_vars)
 
 
+@lru_cache(maxsize=1)
 def is_running_in_kubernetes() -> bool:
     """
     Detect if code is running in Kubernetes pod
@@ -261,15 +647,20 @@ def is_running_in_kubernetes() -> bool:
     Returns:
         True if running in K8s, False otherwise
     """
-    # Check for Kubernetes-specific environment variables
-    k8s_vars = ['KUBERNETES_SERVICE_HOST', 'KUBERNETES_PORT']
-    return all(os.getenv(var) for var in k8s_vars)
+    # KUBERNETES_SERVICE_HOST is the canonical marker the kubelet always
+    # injects; KUBERNETES_PORT is only set when a service exists, so requiring
+    # both silently flipped IS_PRODUCTION to False inside real pods
+    return bool(os.getenv('KUBERNETES_SERVICE_HOST'))
 
 
+@lru_cache(maxsize=1)
 def get_execution_environment() -> str:
     """
     Get the current execution environment
 
+    Cached so repeated callers skip the env-var checks and the /.dockerenv
+    stat syscall.
+
     Returns:
         String describing environment: 'airflow', 'kubernetes', 'docker', or 'local'
     """
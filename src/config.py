@@ -35,12 +35,18 @@ class Config:
     AWS_SECRET_NAME = os.getenv('AWS_SECRET_NAME', 'accsec-ai/credit-bot/credentials')
     S3_BUCKET = os.getenv('S3_BUCKET', 'accsec-ai-credit-bot-state')
     S3_STATE_KEY = os.getenv('S3_STATE_KEY', 'state/processed_messages.json')
+    S3_DETAILS_KEY = os.getenv('S3_DETAILS_KEY', 'state/processing_details.json')
     S3_OUTPUT_PREFIX = os.getenv('S3_OUTPUT_PREFIX', 'outputs')
 
     # Initialize AWS integration if in production
     _aws = None
     _secrets_cache = None
 
+    # Merged secrets + environment snapshot, built on first lookup. Both are
+    # immutable after startup, so freezing them into one dict turns every
+    # config read into a single .get() with env vars taking priority.
+    _frozen = None
+
     @classmethod
     def _get_aws_client(cls):
         """Get or create AWS integration client"""
@@ -59,16 +65,20 @@ class Config:
         aws = cls._get_aws_client()
         if aws is None:
             logger.warning("AWS not available, using environment variables")
-            return {}
+            cls._secrets_cache = {}
+            return cls._secrets_cache
 
         secrets = aws.fetch_secrets(cls.AWS_SECRET_NAME)
         if secrets:
             logger.info("Successfully loaded secrets from AWS Secrets Manager")
-            cls._secrets_cache = secrets
-            return secrets
         else:
             logger.warning("Could not fetch secrets from AWS, falling back to environment variables")
-            return {}
+            secrets = {}
+
+        # Cache the result (including failures) so every property read after
+        # the first hits local memory instead of re-entering the fetch path
+        cls._secrets_cache = secrets
+        return cls._secrets_cache
 
     @classmethod
     def _get_config_value(cls, key: str, default=None):
@@ -78,41 +88,42 @@ class Config:
         2. AWS Secrets Manager (if in production)
         3. Default value
         """
-        # Check environment variable first
-        env_value = os.getenv(key)
-        if env_value is not None:
-            return env_value
-
-        # Check AWS Secrets Manager if in production
-        if cls.IS_PRODUCTION:
-            secrets = cls._fetch_aws_secrets()
-            if key in secrets:
-                return secrets[key]
-
-        # Return default
-        return default
-
-    # Slack Configuration
-    SLACK_BOT_TOKEN = property(lambda self: Config._get_config_value('SLACK_BOT_TOKEN'))
-    SLACK_APP_TOKEN = property(lambda self: Config._get_config_value('SLACK_APP_TOKEN'))
-    SLACK_USER_ID = property(lambda self: Config._get_config_value('SLACK_USER_ID', 'W014QM1DAPN'))
-    SLACK_TEST_CHANNEL = property(lambda self: Config._get_config_value('SLACK_TEST_CHANNEL', 'credit_memo_testing'))
-    SLACK_PROD_CHANNEL = property(lambda self: Config._get_config_value('SLACK_PROD_CHANNEL', 'help-sms-credit-pumping-memos'))
-
-    # Looker Configuration
-    LOOKER_CLIENT_ID = property(lambda self: Config._get_config_value('LOOKER_CLIENT_ID'))
-    LOOKER_CLIENT_SECRET = property(lambda self: Config._get_config_value('LOOKER_CLIENT_SECRET'))
-    LOOKER_BASE_URL = property(lambda self: Config._get_config_value('LOOKER_BASE_URL', 'https://twiliocloud.cloud.looker.com'))
-
-    # Presto Configuration (from AWS Secrets Manager in production)
-    PRESTO_HOST = property(lambda self: Config._get_config_value('PRESTO_HOST'))
-    PRESTO_PORT = property(lambda self: Config._get_config_value('PRESTO_PORT'))
-    PRESTO_USERNAME = property(lambda self: Config._get_config_value('PRESTO_USERNAME'))
-    PRESTO_PASSWORD = property(lambda self: Config._get_config_value('PRESTO_PASSWORD'))
+        if cls._frozen is None:
+            secrets = cls._fetch_aws_secrets() if cls.IS_PRODUCTION else {}
+            cls._frozen = {**secrets, **os.environ}
+        return cls._frozen.get(key, default)
+
+    # Secret-backed settings (name -> default), resolved into plain class
+    # attributes below once the class body has been evaluated. Plain attributes
+    # make Config.SLACK_BOT_TOKEN an O(1) read (and valid as a class access)
+    # instead of a property object requiring instantiation.
+    _SPEC = {
+        # Slack Configuration
+        'SLACK_BOT_TOKEN': None,
+        'SLACK_APP_TOKEN': None,
+        'SLACK_USER_ID': 'W014QM1DAPN',
+        'SLACK_TEST_CHANNEL': 'credit_memo_testing',
+        'SLACK_PROD_CHANNEL': 'help-sms-credit-pumping-memos',
+        # Looker Configuration
+        'LOOKER_CLIENT_ID': None,
+        'LOOKER_CLIENT_SECRET': None,
+        'LOOKER_BASE_URL': 'https://twiliocloud.cloud.looker.com',
+        # Presto Configuration (from AWS Secrets Manager in production)
+        'PRESTO_HOST': None,
+        'PRESTO_PORT': None,
+        'PRESTO_USERNAME': None,
+        'PRESTO_PASSWORD': None,
+    }
 
     # Bot Configuration
     BOT_NAME = os.getenv('BOT_NAME', 'CreditBot')
 
+    # Upper bound on concurrent Looker/notebook workers per message
+    MAX_URL_WORKERS = int(os.getenv('MAX_URL_WORKERS', '8'))
+
+    # Upper bound on messages processed concurrently per run
+    MAX_MESSAGE_WORKERS = int(os.getenv('MAX_MESSAGE_WORKERS', '4'))
+
     # Notebook Configuration
     NOTEBOOK_PATH = project_root / os.getenv('NOTEBOOK_PATH', 'Verify - Credit Recommendation.ipynb')
     OUTPUT_DIR = project_root / os.getenv('OUTPUT_DIR', 'data/outputs')
@@ -125,21 +136,45 @@ class Config:
     # Storage backend (S3 in production, local files in development)
     USE_S3_STORAGE = IS_PRODUCTION and AWS_AVAILABLE
 
-    # Ensure directories exist (for local development and container temp storage)
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # Set by initialize() so repeated calls are no-ops
+    _initialized = False
+
+    @classmethod
+    def initialize(cls):
+        """
+        Create local directories and validate configuration
+
+        Runs from the bot entry point rather than at import time, so merely
+        importing this module (e.g. during Airflow DAG parsing) does no
+        filesystem setup and no secret-dependent validation.
+        """
+        if cls._initialized:
+            return
+        cls._initialized = True
+
+        # Ensure directories exist (for local development and container temp storage)
+        cls.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        cls.LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        cls.STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+        # Validate configuration (only log warnings, don't fail)
+        try:
+            cls.validate()
+        except ValueError as e:
+            logger.warning("Configuration validation failed: %s", e)
+            if cls.EXECUTION_ENV == 'local':
+                print(f"⚠️  Configuration Error: {e}")
+                print(f"Please copy .env.example to .env and fill in your credentials")
+        except Exception as e:
+            logger.warning("Configuration error: %s", e)
 
     @classmethod
     def validate(cls):
         """Validate that required configuration is present"""
-        # Create temp instance to access properties
-        instance = cls()
-
         required = {
-            'SLACK_BOT_TOKEN': instance.SLACK_BOT_TOKEN,
-            'LOOKER_CLIENT_ID': instance.LOOKER_CLIENT_ID,
-            'LOOKER_CLIENT_SECRET': instance.LOOKER_CLIENT_SECRET,
+            'SLACK_BOT_TOKEN': cls.SLACK_BOT_TOKEN,
+            'LOOKER_CLIENT_ID': cls.LOOKER_CLIENT_ID,
+            'LOOKER_CLIENT_SECRET': cls.LOOKER_CLIENT_SECRET,
         }
 
         missing = [key for key, value in required.items() if not value]
@@ -147,14 +182,13 @@ class Config:
         if missing:
             raise ValueError(f"Missing required configuration: {', '.join(missing)}")
 
-        logger.info(f"Configuration validated successfully (environment: {cls.EXECUTION_ENV})")
+        logger.info("Configuration validated successfully (environment: %s)", cls.EXECUTION_ENV)
         return True
 
     @classmethod
     def get_channel(cls):
         """Get the Slack channel for posting (always test channel)"""
-        instance = cls()
-        return instance.SLACK_TEST_CHANNEL
+        return cls.SLACK_TEST_CHANNEL
 
     @classmethod
     def get_aws_client(cls):
@@ -162,13 +196,12 @@ class Config:
         return cls._get_aws_client()
 
 
-# Validate configuration on import (only log warnings, don't fail)
-try:
-    Config.validate()
-except ValueError as e:
-    logger.warning(f"Configuration validation failed: {e}")
-    if Config.EXECUTION_ENV == 'local':
-        print(f"⚠️  Configuration Error: {e}")
-        print(f"Please copy .env.example to .env and fill in your credentials")
-except Exception as e:
-    logger.warning(f"Configuration error: {e}")
+# Materialize secrets once at class-load time so attribute reads never pay an
+# AWS round-trip (the client-side SecretCache in aws_integration bounds staleness)
+if Config.IS_PRODUCTION:
+    Config._fetch_aws_secrets()
+
+# Resolve every secret-backed setting into a plain class attribute
+for _key, _default in Config._SPEC.items():
+    setattr(Config, _key, Config._get_config_value(_key, _default))
+del _key, _default
@@ -3,8 +3,14 @@ Credit Bot - Main Orchestrator
 Coordinates Slack monitoring, Looker query extraction, notebook execution, and result posting
 """
 
+import atexit
 import logging
+import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from typing import Dict, Optional
 from pathlib import Path
 
@@ -14,18 +20,50 @@ from .looker_client import LookerClient
 from .notebook_executor import NotebookExecutor  # TODO: Will be replaced by SageMakerExecutor (see SAGEMAKER_MIGRATION_PLAN.md)
 from .state_manager import StateManager
 
-# Setup logging
+# Directory setup + validation happens here (the bot entry point), not at
+# config import time, so the log file's parent exists before the handler opens
+Config.initialize()
+
+# Setup logging. Records go to an in-memory queue and a background listener
+# thread does the file/stdout write() syscalls, keeping logging off the
+# worker threads' critical path.
+_log_queue = SimpleQueue()
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler(Config.LOG_FILE),
+    logging.StreamHandler(sys.stdout)
+)
 logging.basicConfig(
     level=getattr(logging, Config.LOG_LEVEL),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(Config.LOG_FILE),
-        logging.StreamHandler(sys.stdout)
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 logger = logging.getLogger(__name__)
 
+# Decorative separator, built once instead of per log line
+_SEP = "=" * 80
+
+# Config reads used in per-message/per-URL paths, snapshotted at import so
+# hot code does a single global load instead of a class attribute chain.
+# Config values are immutable after startup, so the snapshot can't go stale.
+_MAX_URL_WORKERS = Config.MAX_URL_WORKERS
+_MAX_MESSAGE_WORKERS = Config.MAX_MESSAGE_WORKERS
+
+# Look-title classification: a title that names PSMS with no Verify terms
+# lets us skip the whole SQL fetch for that URL. Anything ambiguous still
+# goes through the full SQL-based is_verify_query check.
+_PSMS_TITLE_RE = re.compile(r'\bpsms\b|programmable\s+sms', re.IGNORECASE)
+_VERIFY_TITLE_RE = re.compile(r'verify|authy', re.IGNORECASE)
+
+
+def _is_clearly_psms(metadata: Dict) -> bool:
+    """True when a Look's title/description unambiguously indicate PSMS"""
+    text = f"{metadata.get('title') or ''} {metadata.get('description') or ''}"
+    return bool(_PSMS_TITLE_RE.search(text)) and not _VERIFY_TITLE_RE.search(text)
+
 
 class CreditBot:
     """
@@ -34,9 +72,9 @@ class CreditBot:
 
     def __init__(self):
         """Initialize the credit bot with all necessary clients"""
-        logger.info("="*80)
+        logger.info(_SEP)
         logger.info("Initializing CreditBot")
-        logger.info("="*80)
+        logger.info(_SEP)
 
         # Initialize clients
         self.slack = SlackClient()
@@ -44,13 +82,24 @@ class CreditBot:
         self.executor = NotebookExecutor()
         self.state = StateManager()
 
-        # Get channel
+        # Channel resolution goes through SlackClient, whose TTL-bounded
+        # disk cache already skips the paginated conversations.list walk on
+        # warm starts - and can be refreshed if the ID ever goes stale
         self.channel_name = Config.get_channel()
         self.channel_id = None
 
-        logger.info(f"Bot Name: {Config.BOT_NAME}")
-        logger.info(f"Target Channel: #{self.channel_name}")
-        logger.info(f"Notebook: {Config.NOTEBOOK_PATH}")
+        # Serializes StateManager mutations when messages run concurrently
+        self._state_lock = threading.Lock()
+
+        # Slack posts are fire-and-forget from the processing path (a
+        # chat.postMessage round-trip is 150-400ms); run_once waits for the
+        # collected futures before recording the run as complete
+        self._post_pool = ThreadPoolExecutor(max_workers=4)
+        self._pending_posts = []
+
+        logger.info("Bot Name: %s", Config.BOT_NAME)
+        logger.info("Target Channel: #%s", self.channel_name)
+        logger.info("Notebook: %s", Config.NOTEBOOK_PATH)
 
     def initialize(self) -> bool:
         """
@@ -59,9 +108,9 @@ class CreditBot:
         Returns:
             bool: True if all initializations successful
         """
-        logger.info("\n" + "="*80)
+        logger.info(_SEP)
         logger.info("Testing Connections")
-        logger.info("="*80)
+        logger.info(_SEP)
 
         # Test Slack
         if not self.slack.test_connection():
@@ -69,12 +118,13 @@ class CreditBot:
             return False
         logger.info("✅ Slack connection successful")
 
-        # Get channel ID
+        # Get channel ID (SlackClient's TTL-bounded cache skips the
+        # conversations.list pagination when a recent mapping exists)
         self.channel_id = self.slack.get_channel_id(self.channel_name)
         if not self.channel_id:
-            logger.error(f"❌ Channel #{self.channel_name} not found")
+            logger.error("❌ Channel #%s not found", self.channel_name)
             return False
-        logger.info(f"✅ Found channel #{self.channel_name}")
+        logger.info("✅ Found channel #%s", self.channel_name)
 
         # Test Looker
         if not self.looker.authenticate():
@@ -82,7 +132,7 @@ class CreditBot:
             return False
         logger.info("✅ Looker authentication successful")
 
-        logger.info("\n✅ All systems initialized successfully")
+        logger.info("✅ All systems initialized successfully")
         return True
 
     def process_message(self, parsed_request: Dict) -> Dict:
@@ -99,9 +149,9 @@ class CreditBot:
         message_ts = parsed_request['message_ts']
         looker_urls = parsed_request['looker_urls']  # Now a list
 
-        logger.info("\n" + "="*80)
-        logger.info(f"Processing Message: {message_ts}")
-        logger.info("="*80)
+        logger.debug(_SEP)
+        logger.info("Processing Message: %s", message_ts)
+        logger.debug(_SEP)
 
         result = {
             'success': False,
@@ -117,8 +167,9 @@ class CreditBot:
             logger.warning("No Looker link found in message")
             result['error'] = "No Looker link found"
 
-            # Post message requesting Looker link
-            self.slack.post_message(
+            # Post message requesting Looker link (off the critical path)
+            self._submit_post(
+                self.slack.post_message,
                 channel_id=self.channel_id,
                 text="⚠️ Please provide a Looker link for processing",
                 thread_ts=message_ts
@@ -127,75 +178,62 @@ class CreditBot:
 
             return result
 
-        logger.info(f"Found {len(looker_urls)} Looker URL(s) to process")
+        logger.info("Found %d Looker URL(s) to process", len(looker_urls))
 
-        # Process all Looker URLs and accumulate credit amounts
+        # Process all Looker URLs concurrently and accumulate credit amounts.
+        # Each URL is dominated by Looker round-trips and notebook execution
+        # (independent I/O), so wall time collapses from sum-of-latencies to
+        # max-of-latencies. Accumulation happens on this thread only.
         total_credit = 0.0
         successful_executions = []
         processing_errors = []
 
-        for idx, looker_url in enumerate(looker_urls, 1):
-            logger.info(f"\n{'='*80}")
-            logger.info(f"Processing URL {idx}/{len(looker_urls)}")
-            logger.info(f"{'='*80}")
-            logger.info(f"Looker URL: {looker_url}")
-
-            # Step 1: Extract SQL from Looker
-            logger.info(f"\n📊 Step 1: Extracting SQL from Looker...")
-            sql_query = self.looker.get_sql_from_url(looker_url)
-
-            if not sql_query:
-                error_msg = f"Failed to extract SQL from URL {idx}"
-                logger.error(error_msg)
-                processing_errors.append(f"URL {idx}: {error_msg}")
+        max_workers = min(len(looker_urls), _MAX_URL_WORKERS)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self._process_single_url, idx, len(looker_urls), url): idx
+                for idx, url in enumerate(looker_urls, 1)
+            }
+
+            url_results = []
+            for future in as_completed(futures):
+                try:
+                    url_results.append(future.result())
+                except Exception as e:
+                    idx = futures[future]
+                    logger.error("URL %d processing raised: %s", idx, e, exc_info=True)
+                    url_results.append({'idx': idx, 'error': f"Unexpected error: {e}"})
+
+        # Keep log/accumulation order stable regardless of completion order
+        for url_result in sorted(url_results, key=lambda r: r['idx']):
+            idx = url_result['idx']
+            if url_result.get('skipped'):
                 continue
-
-            logger.info(f"✅ SQL extracted ({len(sql_query)} characters)")
-
-            # Step 2: Check if it's a Verify query
-            logger.info(f"\n🔍 Step 2: Checking if this is a Verify query...")
-            is_verify = self.executor.is_verify_query(sql_query)
-
-            if not is_verify:
-                logger.info("This appears to be a PSMS query - skipping silently")
+            if url_result.get('error'):
+                processing_errors.append(f"URL {idx}: {url_result['error']}")
                 continue
 
-            logger.info("✅ Confirmed: This is a Verify query")
-
-            # Step 3: Execute notebook
-            logger.info(f"\n📓 Step 3: Executing notebook...")
-            exec_result = self.executor.execute(sql_query)
-
-            if not exec_result['success']:
-                error_msg = f"Notebook execution failed: {exec_result['error']}"
-                logger.error(error_msg)
-                processing_errors.append(f"URL {idx}: {error_msg}")
-                continue
-
-            credit_amount = exec_result['credit_amount']
-            logger.info(f"✅ Notebook executed successfully")
-            logger.info(f"💰 Credit Amount for URL {idx}: ${credit_amount:.2f}")
-
-            # Accumulate credit amount
+            credit_amount = url_result['amount']
+            logger.info("💰 Credit Amount for URL %d: $%.2f", idx, credit_amount)
             total_credit += credit_amount
             successful_executions.append({
-                'url': looker_url,
+                'url': url_result['url'],
                 'amount': credit_amount
             })
 
         # Check if we had any successful executions
         if not successful_executions:
             error_summary = "; ".join(processing_errors) if processing_errors else "No Verify queries found or all processing failed"
-            logger.error(f"No successful executions: {error_summary}")
+            logger.error("No successful executions: %s", error_summary)
             result['error'] = error_summary
             self._handle_error(parsed_request, result['error'])
             return result
 
         # Step 4: Post combined result to Slack
-        logger.info(f"\n{'='*80}")
-        logger.info(f"All URLs Processed - Total: ${total_credit:.2f}")
-        logger.info(f"{'='*80}")
-        logger.info(f"\n💬 Step 4: Posting combined result to Slack...")
+        logger.debug(_SEP)
+        logger.info("All URLs Processed - Total: $%.2f", total_credit)
+        logger.debug(_SEP)
+        logger.info("💬 Step 4: Posting combined result to Slack...")
 
         post_success = self._post_result(
             channel_id=self.channel_id,
@@ -208,12 +246,105 @@ class CreditBot:
         result['posted_to_slack'] = post_success
         result['urls_processed'] = successful_executions
 
-        logger.info("\n✅ Message processing complete")
+        logger.info("✅ Message processing complete")
         return result
 
+    def _process_single_url(self, idx: int, total: int, looker_url: str) -> Dict:
+        """
+        Process one Looker URL: extract SQL, classify, execute notebook
+
+        Runs on a worker thread; touches no shared mutable state and returns
+        everything the caller needs to accumulate results.
+
+        Args:
+            idx: 1-based position of this URL in the message
+            total: Total number of URLs in the message
+            looker_url: Looker URL to process
+
+        Returns:
+            Dict with 'idx', 'url', and either 'amount', 'skipped', or 'error'
+        """
+        logger.info("Processing URL %d/%d: %s", idx, total, looker_url)
+        result = {'idx': idx, 'url': looker_url}
+
+        # Step 0: For Look URLs, a small metadata fetch can classify the
+        # request from the title alone - no point downloading SQL for a
+        # Look that is clearly PSMS
+        look_id = self.looker.extract_look_id(looker_url)
+        metadata = self.looker.get_look_metadata(look_id) if look_id else None
+        if metadata and _is_clearly_psms(metadata):
+            logger.info("URL %d title indicates PSMS (%r) - skipping without SQL fetch",
+                        idx, metadata.get('title'))
+            result['skipped'] = True
+            return result
+
+        # Step 1: Extract SQL from Looker (reusing the query_id from the
+        # metadata fetch to skip the Look -> query_id round-trip)
+        if look_id:
+            sql_query = self.looker.get_look_sql(
+                look_id, query_id=(metadata or {}).get('query_id'))
+        else:
+            sql_query = self.looker.get_sql_from_url(looker_url)
+        if not sql_query:
+            logger.error("Failed to extract SQL from URL %d", idx)
+            result['error'] = f"Failed to extract SQL from URL {idx}"
+            return result
+
+        logger.info("✅ URL %d: SQL extracted (%d characters)", idx, len(sql_query))
+
+        # Step 2: Check if it's a Verify query
+        if not self.executor.is_verify_query(sql_query):
+            logger.info("URL %d appears to be a PSMS query - skipping silently", idx)
+            result['skipped'] = True
+            return result
+
+        logger.info("✅ URL %d: Confirmed Verify query, executing notebook...", idx)
+
+        # Step 3: Execute notebook
+        exec_result = self.executor.execute(sql_query)
+        if not exec_result['success']:
+            logger.error("Notebook execution failed for URL %d: %s", idx, exec_result['error'])
+            result['error'] = f"Notebook execution failed: {exec_result['error']}"
+            return result
+
+        result['amount'] = exec_result['credit_amount']
+        return result
+
+    def _submit_post(self, fn, *args, **kwargs):
+        """
+        Queue a Slack call on the posting pool and track its future
+
+        list.append is atomic under the GIL, so worker threads can submit
+        without extra locking; _wait_for_posts drains the list.
+        """
+        future = self._post_pool.submit(fn, *args, **kwargs)
+        self._pending_posts.append(future)
+        return future
+
+    def _wait_for_posts(self, timeout: float = 30.0):
+        """
+        Wait for all queued Slack posts to complete (bounded)
+
+        Called at the end of run_once before the last-check timestamp is
+        recorded, so a run never reports complete with deliveries in flight.
+        """
+        pending, self._pending_posts = self._pending_posts, []
+        if not pending:
+            return
+        done, not_done = wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning("%d Slack post(s) still in flight after %ss wait",
+                           len(not_done), timeout)
+        failed = sum(1 for f in done if f.exception() or not f.result())
+        if failed:
+            logger.error("❌ %d Slack post(s) failed", failed)
+
     def _post_result(self, channel_id: str, thread_ts: str, credit_amount: float) -> bool:
         """
-        Post credit amount result to Slack thread
+        Queue the credit amount result for posting to the Slack thread
+
+        The network round-trip happens on the posting pool; run_once waits
+        for delivery before finishing.
 
         Args:
             channel_id: Channel ID
@@ -221,22 +352,20 @@ class CreditBot:
             credit_amount: Calculated credit amount
 
         Returns:
-            bool: True if posted successfully
+            bool: True (the post was queued)
         """
         # Format message as requested: "Approved, (amount), (category)"
         # Category defaults to "exceptions" for now
         message = f"Approved, ${credit_amount:.2f}, exceptions"
 
-        success = self.slack.post_message(
+        self._submit_post(
+            self.slack.post_message,
             channel_id=channel_id,
             text=message,
             thread_ts=thread_ts
         )
-        if success:
-            logger.info(f"✅ Posted result to Slack: {message}")
-        else:
-            logger.error("❌ Failed to post result to Slack")
-        return success
+        logger.info("💬 Queued result for Slack: %s", message)
+        return True
 
     def _handle_error(self, parsed_request: Dict, error_message: str):
         """
@@ -257,8 +386,8 @@ class CreditBot:
         )
 
         if Config.SLACK_USER_ID:
-            self.slack.send_dm(Config.SLACK_USER_ID, dm_text)
-            logger.info(f"✅ Sent error DM to {Config.SLACK_USER_ID}")
+            self._submit_post(self.slack.send_dm, Config.SLACK_USER_ID, dm_text)
+            logger.info("✅ Queued error DM to %s", Config.SLACK_USER_ID)
         else:
             logger.warning("No SLACK_USER_ID configured for error DMs")
 
@@ -266,63 +395,127 @@ class CreditBot:
         """
         Run one iteration of message checking and processing
         """
-        logger.info("\n" + "="*80)
+        logger.info(_SEP)
         logger.info("Starting Message Check")
-        logger.info("="*80)
+        logger.info(_SEP)
 
-        # Get recent messages
+        # Get recent messages. A failed fetch usually means the cached
+        # channel ID went stale (renamed/archived channel): re-resolve
+        # bypassing the cache and retry once rather than silently treating
+        # the error as an empty channel forever.
         messages = self.slack.get_recent_messages(self.channel_id, limit=50)
-        logger.info(f"Retrieved {len(messages)} messages")
+        if messages is None:
+            logger.warning("History fetch failed - re-resolving channel ID for #%s",
+                           self.channel_name)
+            refreshed = self.slack.get_channel_id(self.channel_name, refresh=True)
+            if refreshed:
+                self.channel_id = refreshed
+                messages = self.slack.get_recent_messages(self.channel_id, limit=50)
+            if messages is None:
+                logger.error("❌ Could not fetch messages from #%s", self.channel_name)
+                return
+        logger.info("Retrieved %d messages", len(messages))
 
         # Filter out already processed
         unprocessed = self.state.get_unprocessed_messages(messages)
-        logger.info(f"Found {len(unprocessed)} unprocessed messages")
+        logger.info("Found %d unprocessed messages", len(unprocessed))
 
         if not unprocessed:
             logger.info("No new messages to process")
             self.state.update_last_check()
             return
 
-        # Process each unprocessed message
-        for message in unprocessed:
-            parsed = self.slack.parse_credit_request(message)
-
-            if not parsed:
-                continue
-
-            # Process the message
-            result = self.process_message(parsed)
-
-            # Mark as processed (even if it failed, so we don't retry indefinitely)
-            self.state.mark_processed(
-                parsed['message_ts'],
-                metadata={
-                    'success': result['success'],
-                    'credit_amount': result['credit_amount'],
-                    'error': result['error']
+        # Parse first, then process messages concurrently - each message is
+        # independent (distinct message_ts) and dominated by Looker/notebook
+        # I/O, so this multiplies with the per-URL parallelism when a backlog
+        # accumulates. State is only mutated here as results complete.
+        parsed_requests = self.slack.parse_credit_requests(unprocessed)
+
+        if parsed_requests:
+            max_workers = min(len(parsed_requests), _MAX_MESSAGE_WORKERS)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = {
+                    pool.submit(self.process_message, parsed): parsed
+                    for parsed in parsed_requests
                 }
-            )
 
-        # Update last check timestamp
-        self.state.update_last_check()
+                for future in as_completed(futures):
+                    parsed = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error("Message %s raised: %s", parsed['message_ts'], e, exc_info=True)
+                        result = {'success': False, 'credit_amount': None,
+                                  'error': f"Unexpected error: {e}"}
+
+                    # Mark as processed (even if it failed, so we don't retry indefinitely)
+                    with self._state_lock:
+                        self.state.mark_processed(
+                            parsed['message_ts'],
+                            metadata={
+                                'success': result['success'],
+                                'credit_amount': result['credit_amount'],
+                                'error': result['error']
+                            }
+                        )
+
+        # Drain in-flight Slack posts, then record the run as complete
+        self._wait_for_posts()
+        with self._state_lock:
+            self.state.update_last_check()
 
         # Print stats
         stats = self.state.get_stats()
-        logger.info("\n" + "="*80)
+        logger.info(_SEP)
         logger.info("Session Complete")
-        logger.info("="*80)
-        logger.info(f"Total Processed (All Time): {stats['total_processed']}")
-        logger.info(f"Last Check: {stats['last_check']}")
+        logger.info(_SEP)
+        logger.info("Total Processed (All Time): %s", stats['total_processed'])
+        logger.info("Last Check: %s", stats['last_check'])
+
+
+def _run_pre_checks() -> bool:
+    """
+    Pre-execution health checks
+
+    Runs in-process rather than as a separate Airflow/K8s task so the DAG
+    stays a single pod and extra checks don't each pay pod-startup cost.
+
+    Returns:
+        bool: True if the bot is clear to run
+    """
+    if not Config.NOTEBOOK_PATH.exists():
+        logger.error("Notebook not found: %s", Config.NOTEBOOK_PATH)
+        return False
+    return True
+
+
+def _run_post_hooks(exit_code: int):
+    """
+    Post-execution hooks (notifications, metrics)
+
+    Same in-pod rationale as _run_pre_checks: add follow-up work here, not as
+    additional KubernetesPodOperator tasks.
+
+    Args:
+        exit_code: Exit code the run is about to return
+    """
+    if exit_code != 0:
+        logger.warning("Run finished with exit code %d", exit_code)
 
 
 def main():
     """Main entry point"""
-    logger.info("\n" + "="*80)
-    logger.info(f"CREDIT BOT - {Config.BOT_NAME}")
-    logger.info("="*80)
-    logger.info(f"Environment: {Config.EXECUTION_ENV}")
-    logger.info(f"S3 Storage: {'Enabled' if Config.USE_S3_STORAGE else 'Disabled (Local)'}")
-    logger.info("="*80 + "\n")
+    logger.info(_SEP)
+    logger.info("CREDIT BOT - %s", Config.BOT_NAME)
+    logger.info(_SEP)
+    logger.info("Environment: %s", Config.EXECUTION_ENV)
+    logger.info("S3 Storage: %s", 'Enabled' if Config.USE_S3_STORAGE else 'Disabled (Local)')
+    logger.info(_SEP)
+
+    # Pre-execution checks
+    if not _run_pre_checks():
+        logger.error("Pre-execution checks failed. Exiting.")
+        return 1
 
     # Create bot
     bot = CreditBot()
@@ -335,14 +528,17 @@ def main():
     # Run once
     try:
         bot.run_once()
-        logger.info("\n✅ Bot execution complete")
-        return 0
+        logger.info("✅ Bot execution complete")
+        exit_code = 0
     except KeyboardInterrupt:
-        logger.info("\n\n⚠️ Bot stopped by user")
-        return 130
+        logger.info("⚠️ Bot stopped by user")
+        exit_code = 130
     except Exception as e:
-        logger.error(f"\n❌ Unexpected error: {e}", exc_info=True)
-        return 1
+        logger.error("❌ Unexpected error: %s", e, exc_info=True)
+        exit_code = 1
+
+    _run_post_hooks(exit_code)
+    return exit_code
 
 
 if __name__ == "__main__":
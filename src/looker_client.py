@@ -3,18 +3,63 @@ Looker API Client
 Handles authentication and SQL query extraction from Looker
 """
 
+import atexit
+import json
+import os
+import re
+import threading
+import time
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, parse_qs
 from typing import Optional
 from .config import Config
 
+# Prefer orjson for API response parsing (2-5x faster than the stdlib
+# parser behind response.json()); fall back to stdlib otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def _loads(body):
+    """Parse a JSON string/bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _parse_json(response: requests.Response) -> dict:
+    """Parse a JSON response body, using orjson when available"""
+    return _loads(response.content)
+
+# How long memoized SQL stays valid (seconds); Looks cited repeatedly across
+# credit requests in one run resolve to the same SQL
+SQL_CACHE_TTL = 600
+
+# Bounds for the persisted ETag cache: entries refresh their timestamp on
+# every hit, so actively cited Looks stay cached while dead URLs age out,
+# and the cap keeps the cache file (which stores response bodies) from
+# growing without limit over weeks of runs
+ETAG_CACHE_TTL = 86400
+ETAG_CACHE_MAX = 256
+
+
 class LookerClient:
     """Client for interacting with Looker API"""
 
+    # URL parsing: precompiled patterns beat urlparse + split chains when
+    # batch-processing hundreds of historical message URLs. \d+ stops at
+    # '/' or '?' on its own, so no query-string trimming is needed.
+    _LOOK_ID_RE = re.compile(r'/looks/(\d+)')
+    _SHORT_RE = re.compile(r'/x/([A-Za-z0-9]+)')
+
     def __init__(self, client_id: str = None, client_secret: str = None, base_url: str = None):
         """
         Initialize Looker client
@@ -29,6 +74,92 @@ class LookerClient:
         self.base_url = (base_url or Config.LOOKER_BASE_URL).rstrip('/')
         self.api_url = f"{self.base_url}/api/4.0"
         self.access_token = None
+        self.expires_at = 0.0
+
+        # Looker tokens live ~1 hour; caching one across pod restarts saves an
+        # auth round-trip per 15-minute run
+        self._token_cache_file = Config.STATE_FILE.parent / 'looker_token.json'
+        self._load_cached_token()
+
+        # look_id -> (sql, cached_at); duplicate Looks across messages are
+        # common (recurring reports), so skip their 2-call API chains
+        self._sql_cache = {}
+
+        # url -> {'etag', 'body', 'cached_at'}; Look/query definitions rarely
+        # change, so conditional GETs let Looker answer 304 with an empty body
+        # instead of re-sending (and us re-parsing) the payload. No staleness
+        # risk: Looker invalidates the ETag when a Look is edited. Bounded by
+        # ETAG_CACHE_MAX/TTL and persisted once at exit, not per request;
+        # the lock covers concurrent URL workers mutating/evicting entries.
+        self._etag_cache_file = Config.STATE_FILE.parent / 'looker_etag_cache.json'
+        self._etag_lock = threading.Lock()
+        self._etag_cache = self._load_etag_cache()
+        atexit.register(self._save_etag_cache)
+
+        # Keep-alive session: every Look fetch is 2-3 round-trips, so reusing
+        # the TCP+TLS connection skips a handshake per call. The adapter also
+        # retries transient/rate-limit statuses with backoff.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504]
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _load_cached_token(self):
+        """Load a previously cached access token if it hasn't expired"""
+        try:
+            if self._token_cache_file.exists():
+                with open(self._token_cache_file, 'r') as f:
+                    cached = json.load(f)
+                if time.time() < cached.get('expires_at', 0) - 60:
+                    self.access_token = cached['access_token']
+                    self.expires_at = cached['expires_at']
+                    logger.info("Reusing cached Looker access token")
+        except Exception as e:
+            logger.debug(f"Could not load cached Looker token: {e}")
+
+    def _save_cached_token(self):
+        """Persist the current access token for the next run (best effort)"""
+        try:
+            self._token_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._token_cache_file, 'w') as f:
+                json.dump({'access_token': self.access_token,
+                           'expires_at': self.expires_at}, f)
+        except Exception as e:
+            logger.debug(f"Could not cache Looker token: {e}")
+
+    def _load_etag_cache(self) -> dict:
+        """Load the persisted ETag cache, dropping entries past the TTL"""
+        try:
+            if self._etag_cache_file.exists():
+                with open(self._etag_cache_file, 'r') as f:
+                    cached = json.load(f)
+                cutoff = time.time() - ETAG_CACHE_TTL
+                return {url: entry for url, entry in cached.items()
+                        if entry.get('cached_at', 0) > cutoff}
+        except Exception as e:
+            logger.debug(f"Could not load ETag cache: {e}")
+        return {}
+
+    def _save_etag_cache(self):
+        """Persist the ETag cache for the next run (best effort, at exit)"""
+        try:
+            self._etag_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with self._etag_lock:
+                payload = json.dumps(self._etag_cache)
+            tmp_file = self._etag_cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_file, self._etag_cache_file)
+        except Exception as e:
+            logger.debug(f"Could not save ETag cache: {e}")
 
     def authenticate(self) -> bool:
         """
@@ -39,7 +170,7 @@ class LookerClient:
         """
         try:
             auth_url = f"{self.api_url}/login"
-            response = requests.post(
+            response = self.session.post(
                 auth_url,
                 data={
                     'client_id': self.client_id,
@@ -48,13 +179,20 @@ class LookerClient:
             )
             response.raise_for_status()
 
-            data = response.json()
+            data = _parse_json(response)
             self.access_token = data.get('access_token')
 
             if not self.access_token:
                 logger.error("No access token in Looker API response")
                 return False
 
+            self.expires_at = time.time() + data.get('expires_in', 3600)
+            self._save_cached_token()
+
+            # Fresh auth is a natural boundary to drop memoized SQL, keeping
+            # results from going stale across deploys
+            self._sql_cache.clear()
+
             logger.info("Successfully authenticated with Looker API")
             return True
 
@@ -64,7 +202,8 @@ class LookerClient:
 
     def _get_headers(self) -> dict:
         """Get request headers with authentication token"""
-        if not self.access_token:
+        # Re-auth only when the token is missing or about to expire
+        if not self.access_token or time.time() >= self.expires_at - 60:
             if not self.authenticate():
                 raise RuntimeError("Failed to authenticate with Looker")
 
@@ -73,6 +212,73 @@ class LookerClient:
             'Content-Type': 'application/json'
         }
 
+    def _api_get(self, url: str) -> requests.Response:
+        """
+        Authenticated GET with a single retry on 401
+
+        A cached token can be revoked server-side before its recorded expiry;
+        on 401 we discard it, re-authenticate, and retry once.
+        """
+        response = self.session.get(url, headers=self._get_headers())
+        if response.status_code == 401:
+            logger.info("Looker token rejected (401), re-authenticating")
+            self.access_token = None
+            response = self.session.get(url, headers=self._get_headers())
+        response.raise_for_status()
+        return response
+
+    def _conditional_get(self, url: str) -> str:
+        """
+        Authenticated GET with If-None-Match from the persistent ETag cache
+
+        On 304 Not Modified the cached body is returned without transfer or
+        re-parse cost; on 200 the cache entry is refreshed. Falls back to
+        _api_get semantics (401 retry-once) for the auth handling.
+
+        Args:
+            url: Full API URL (used as the cache key)
+
+        Returns:
+            Response body text (possibly from cache)
+        """
+        cached = self._etag_cache.get(url)
+
+        def _get():
+            headers = self._get_headers()
+            if cached:
+                headers['If-None-Match'] = cached['etag']
+            return self.session.get(url, headers=headers)
+
+        response = _get()
+        if response.status_code == 401:
+            logger.info("Looker token rejected (401), re-authenticating")
+            self.access_token = None
+            response = _get()
+
+        if response.status_code == 304 and cached:
+            logger.debug("ETag hit for %s (304 Not Modified)", url)
+            # Refresh the timestamp so actively cited Looks don't age out
+            cached['cached_at'] = time.time()
+            return cached['body']
+
+        response.raise_for_status()
+
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._etag_lock:
+                self._etag_cache[url] = {
+                    'etag': etag,
+                    'body': response.text,
+                    'cached_at': time.time()
+                }
+                # Evict the least recently used entry once over the cap;
+                # persistence happens once at exit, not per request
+                while len(self._etag_cache) > ETAG_CACHE_MAX:
+                    oldest = min(self._etag_cache,
+                                 key=lambda u: self._etag_cache[u].get('cached_at', 0))
+                    del self._etag_cache[oldest]
+        return response.text
+
     def extract_look_id(self, url: str) -> Optional[str]:
         """
         Extract Look ID from Looker URL
@@ -87,29 +293,19 @@ class LookerClient:
             https://twilio.cloud.looker.com/looks/12345 -> "12345"
             https://twilio.cloud.looker.com/x/abcd1234 -> None (explore link)
         """
-        try:
-            parsed = urlparse(url)
-
-            # Check for /looks/ pattern
-            if '/looks/' in parsed.path:
-                parts = parsed.path.split('/looks/')
-                if len(parts) > 1:
-                    look_id = parts[1].split('/')[0].split('?')[0]
-                    return look_id
-
-            # Check for /x/ pattern (short links)
-            # These require a different API call
-            if '/x/' in parsed.path:
-                logger.warning(f"Short link format detected: {url}")
-                logger.warning("Short links not yet supported - please use full Look URL")
-                return None
-
-            logger.warning(f"Could not extract Look ID from URL: {url}")
+        match = self._LOOK_ID_RE.search(url)
+        if match:
+            return match.group(1)
+
+        # Check for /x/ pattern (short links)
+        # These require a different API call
+        if self._SHORT_RE.search(url):
+            logger.warning("Short link format detected: %s", url)
+            logger.warning("Short links not yet supported - please use full Look URL")
             return None
 
-        except Exception as e:
-            logger.error(f"Error parsing Looker URL: {e}")
-            return None
+        logger.warning("Could not extract Look ID from URL: %s", url)
+        return None
 
     def extract_query_id(self, url: str) -> Optional[str]:
         """
@@ -146,57 +342,130 @@ class LookerClient:
             logger.error(f"Error extracting query ID from URL: {e}")
             return None
 
-    def get_look_sql(self, look_id: str) -> Optional[str]:
+    def _get_look_query_id(self, look_id: str) -> Optional[str]:
         """
-        Get SQL query for a Look by ID
+        Get the query_id for a Look
+
+        Requests only the query_id field - the full Look payload can be
+        10-50x larger than the one field we need.
 
         Args:
             look_id: Look ID
 
         Returns:
-            SQL query string if found, None otherwise
+            Query ID if found, None otherwise
         """
         try:
-            # First, get the Look details to get the query_id
-            look_url = f"{self.api_url}/looks/{look_id}"
-            response = requests.get(look_url, headers=self._get_headers())
-            response.raise_for_status()
-
-            look_data = response.json()
-            query_id = look_data.get('query_id')
+            look_url = f"{self.api_url}/looks/{look_id}?fields=query_id"
+            body = self._conditional_get(look_url)
 
+            query_id = _loads(body).get('query_id')
             if not query_id:
                 logger.error(f"No query_id found for Look {look_id}")
                 return None
+            return query_id
 
-            # Now get the query details to get the SQL
-            query_url = f"{self.api_url}/queries/{query_id}"
-            response = requests.get(query_url, headers=self._get_headers())
-            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching Look {look_id}: {e}")
+            return None
 
-            query_data = response.json()
+    def get_look_metadata(self, look_id: str) -> Optional[dict]:
+        """
+        Get a Look's title, description and query_id in one small fetch
 
-            # The SQL might be in different fields depending on query type
-            sql = None
+        The metadata payload is tiny compared to the SQL body, and the title
+        alone is often enough to classify a request - callers can skip the
+        full SQL chain entirely when it is.
 
-            # Try different possible SQL fields
-            if 'sql' in query_data:
-                sql = query_data['sql']
-            elif 'client_id' in query_data:
-                # For some queries, we need to run them to get SQL
-                sql = self._run_query_for_sql(query_id)
+        Args:
+            look_id: Look ID
 
-            if sql:
-                logger.info(f"Successfully extracted SQL from Look {look_id}")
-                return sql
-            else:
-                logger.error(f"Could not find SQL in query {query_id}")
-                return None
+        Returns:
+            Dict with 'title', 'description', 'query_id' if found, else None
+        """
+        try:
+            look_url = f"{self.api_url}/looks/{look_id}?fields=title,description,query_id"
+            return _loads(self._conditional_get(look_url))
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching Look SQL: {e}")
+            logger.error(f"Error fetching metadata for Look {look_id}: {e}")
             return None
 
+    def get_look_sql(self, look_id: str, query_id: str = None) -> Optional[str]:
+        """
+        Get SQL query for a Look by ID
+
+        Args:
+            look_id: Look ID
+            query_id: Known query ID (e.g. from get_look_metadata); skips the
+                      Look -> query_id resolution round-trip when provided
+
+        Returns:
+            SQL query string if found, None otherwise
+        """
+        cached = self._sql_cache.get(look_id)
+        if cached and time.time() - cached[1] < SQL_CACHE_TTL:
+            logger.info(f"Using memoized SQL for Look {look_id}")
+            return cached[0]
+
+        if not query_id:
+            query_id = self._get_look_query_id(look_id)
+        if not query_id:
+            return None
+
+        sql = self.get_query_sql(query_id)
+        if sql:
+            logger.info(f"Successfully extracted SQL from Look {look_id}")
+            self._sql_cache[look_id] = (sql, time.time())
+        return sql
+
+    def get_sql_from_urls(self, urls: list) -> dict:
+        """
+        Extract SQL for a batch of Looker URLs with pipelined API calls
+
+        Stage 1 resolves all Look URLs to query IDs concurrently; stage 2
+        fetches all SQL bodies concurrently. Two waves of parallel requests
+        instead of 2-3 serial round-trips per URL.
+
+        Args:
+            urls: List of Looker Look or Explore URLs
+
+        Returns:
+            Dict mapping each URL to its SQL string (or None on failure)
+        """
+        results = {}
+        look_ids = {}    # url -> look_id
+        query_ids = {}   # url -> query_id
+
+        for url in urls:
+            look_id = self.extract_look_id(url)
+            if look_id:
+                look_ids[url] = look_id
+                continue
+            query_id = self.extract_query_id(url)
+            if query_id:
+                query_ids[url] = query_id
+            else:
+                results[url] = None
+
+        # Stage 1: Look -> query_id
+        if look_ids:
+            with ThreadPoolExecutor(max_workers=min(len(look_ids), 8)) as pool:
+                for url, query_id in zip(look_ids,
+                                         pool.map(self._get_look_query_id, look_ids.values())):
+                    if query_id:
+                        query_ids[url] = query_id
+                    else:
+                        results[url] = None
+
+        # Stage 2: query_id -> SQL
+        if query_ids:
+            with ThreadPoolExecutor(max_workers=min(len(query_ids), 8)) as pool:
+                results.update(zip(query_ids,
+                                   pool.map(self.get_query_sql, query_ids.values())))
+
+        return results
+
     def get_query_sql(self, query_id: str) -> Optional[str]:
         """
         Get SQL query directly from a query ID
@@ -209,12 +478,12 @@ class LookerClient:
             SQL query string if found, None otherwise
         """
         try:
-            # Get the query details to get the SQL
-            query_url = f"{self.api_url}/queries/{query_id}"
-            response = requests.get(query_url, headers=self._get_headers())
-            response.raise_for_status()
+            # Get the query details to get the SQL (project down to the two
+            # fields we inspect instead of the whole query payload)
+            query_url = f"{self.api_url}/queries/{query_id}?fields=sql,client_id"
+            body = self._conditional_get(query_url)
 
-            query_data = response.json()
+            query_data = _loads(body)
 
             # Try different possible SQL fields
             sql = None
@@ -248,8 +517,7 @@ class LookerClient:
         """
         try:
             run_url = f"{self.api_url}/queries/{query_id}/run/sql"
-            response = requests.get(run_url, headers=self._get_headers())
-            response.raise_for_status()
+            response = self._api_get(run_url)
 
             return response.text
 
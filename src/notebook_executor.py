@@ -6,8 +6,14 @@ Supports S3 storage for outputs in production
 
 import papermill as pm
 import nbformat
+import atexit
 import logging
 import json
+import re
+import threading
+import time
+import uuid
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Dict, Any
 from datetime import datetime
@@ -15,6 +21,79 @@ from .config import Config
 
 logger = logging.getLogger(__name__)
 
+# Persistent-kernel execution: papermill spawns a fresh ipykernel subprocess
+# per run (1-3s startup plus re-importing pandas/boto3 every time); reusing a
+# warm kernel via nbclient amortizes that to zero after the first execution
+try:
+    from jupyter_client.manager import KernelManager
+    from nbclient import NotebookClient
+    NBCLIENT_AVAILABLE = True
+except ImportError:
+    NBCLIENT_AVAILABLE = False
+
+# Prefer orjson for parsing executed notebooks (megabytes of JSON when cells
+# emit dataframes/plots); fall back to stdlib-backed nbformat otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Matches dollar amounts / bare numbers in cell outputs
+_CREDIT_RE = re.compile(r'\$?(\d+\.?\d*)')
+
+# Deletes $/comma/quote characters in one C-level pass instead of a chain
+# of .replace() calls that each allocate an intermediate string
+_MONEY_TRANS = str.maketrans('', '', "$,'\"")
+
+# Summary-section cell selection: one automaton pass over the source
+# instead of a substring scan per keyword
+_SUMMARY_KEYWORDS_RE = re.compile(r'output_df|credit_amount|asid_df|blocking')
+
+
+def _parse_money(text) -> Optional[float]:
+    """
+    Parse a cell-output value like '$4,948.80', "'4948.8'" or 4948.8
+
+    Shared by every extraction path so the $/comma/quote stripping rules
+    stay in one place.
+
+    Returns:
+        Parsed float, or None if the text isn't a money-like value
+    """
+    if isinstance(text, list):
+        text = ''.join(text)
+    cleaned = str(text).strip().translate(_MONEY_TRANS)
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+# Verify-query detection: single compiled scans instead of lowercasing a
+# 5-50KB SQL copy plus multiple substring passes. SQL is ASCII, so
+# re.ASCII skips full Unicode case folding.
+_AUTHY_RE = re.compile(r'authy', re.IGNORECASE | re.ASCII)
+_VERIFY_CONTEXT_RE = re.compile(
+    r'billable_item_metadata_alex\.product|billable_items\.friendly_name',
+    re.IGNORECASE | re.ASCII
+)
+
+
+@lru_cache(maxsize=256)
+def _is_verify_query(sql_query: str) -> bool:
+    """
+    Classify a SQL body as Verify vs PSMS (memoized)
+
+    Recurring Looks resolve to identical SQL strings, so repeat
+    classifications hit the cache instead of re-scanning a 5-50KB body.
+    Module-level so lru_cache keys on the SQL alone, not the executor.
+    """
+    # Look for "authy" first (cheap early-out), then confirm it's in the
+    # context of the product/friendly_name columns
+    if not _AUTHY_RE.search(sql_query):
+        return False
+
+    return bool(_VERIFY_CONTEXT_RE.search(sql_query))
+
 
 class NotebookExecutor:
     """Executor for running Jupyter notebooks with parameters"""
@@ -32,6 +111,14 @@ class NotebookExecutor:
         self.use_s3 = Config.USE_S3_STORAGE
         self.aws_client = Config.get_aws_client() if self.use_s3 else None
 
+        # Warm kernel, started lazily on first execution. One kernel serves
+        # all executions; the lock serializes access since concurrent
+        # URL workers share this executor. The atexit hook makes sure the
+        # kernel subprocess doesn't outlive the pod's main process.
+        self._km = None
+        self._kernel_lock = threading.Lock()
+        atexit.register(self.shutdown_kernel)
+
         # Verify notebook exists
         if not self.notebook_path.exists():
             raise FileNotFoundError(f"Notebook not found: {self.notebook_path}")
@@ -40,6 +127,96 @@ class NotebookExecutor:
         if self.use_s3:
             logger.info(f"S3 storage enabled: s3://{Config.S3_BUCKET}/{Config.S3_OUTPUT_PREFIX}")
 
+    def _get_kernel(self):
+        """Start (or reuse) the persistent kernel"""
+        if self._km is None or not self._km.is_alive():
+            self._km = KernelManager(kernel_name='python3')
+            self._km.start_kernel()
+            logger.info("Started persistent notebook kernel")
+        return self._km
+
+    def shutdown_kernel(self):
+        """Shut down the persistent kernel if one is running"""
+        if self._km is not None:
+            try:
+                self._km.shutdown_kernel(now=True)
+                logger.info("Shut down persistent notebook kernel")
+            except Exception as e:
+                logger.warning(f"Error shutting down kernel: {e}")
+            self._km = None
+
+    @staticmethod
+    def _parameterize(nb, parameters: Dict[str, Any]):
+        """
+        Inject a parameters cell, following papermill's convention
+
+        The injected cell goes right after the cell tagged 'parameters' (or
+        first if no cell is tagged), so notebook defaults are overridden.
+
+        Args:
+            nb: NotebookNode to modify in place
+            parameters: Parameter name -> value mapping
+        """
+        source = '\n'.join(f'{name} = {value!r}' for name, value in parameters.items())
+        param_cell = nbformat.v4.new_code_cell(source=source)
+        param_cell.metadata['tags'] = ['injected-parameters']
+
+        insert_at = 0
+        for idx, cell in enumerate(nb.cells):
+            if 'parameters' in cell.get('metadata', {}).get('tags', []):
+                insert_at = idx + 1
+                break
+        nb.cells.insert(insert_at, param_cell)
+
+    def _execute_notebook(self, parameters: Dict[str, Any], output_path: Path):
+        """
+        Execute the notebook with parameters and return the in-memory result
+
+        Uses the warm persistent kernel via nbclient when available (skipping
+        papermill's per-run kernel spawn); falls back to papermill otherwise.
+        The executed NotebookNode is returned directly so the success path
+        never serializes the multi-MB notebook to disk just to re-parse it.
+        A kernel that fails mid-execution is recycled so the next run gets a
+        clean one.
+
+        Args:
+            parameters: Parameters to inject
+            output_path: Where the papermill fallback writes the executed
+                         notebook (the nbclient path keeps it in memory)
+
+        Returns:
+            Executed NotebookNode
+        """
+        if not NBCLIENT_AVAILABLE:
+            pm.execute_notebook(
+                input_path=str(self.notebook_path),
+                output_path=str(output_path),
+                parameters=parameters,
+                kernel_name='python3'
+            )
+            return self._read_notebook(output_path)
+
+        nb = nbformat.read(str(self.notebook_path), as_version=4)
+        self._parameterize(nb, parameters)
+
+        with self._kernel_lock:
+            try:
+                client = NotebookClient(nb, km=self._get_kernel(), allow_errors=False)
+                client.execute()
+            except Exception:
+                # Kernel state is suspect after a failure - recycle it
+                self.shutdown_kernel()
+                # Persist the partially executed notebook for debugging;
+                # the success path never writes it
+                try:
+                    nbformat.write(nb, str(output_path))
+                    logger.info(f"Saved failed notebook for debugging: {output_path}")
+                except Exception as write_err:
+                    logger.warning(f"Could not save failed notebook: {write_err}")
+                raise
+
+        return nb
+
     def execute(self, looker_query: str, asid: str = None) -> Dict[str, Any]:
         """
         Execute notebook with SQL query parameter
@@ -58,36 +235,56 @@ class NotebookExecutor:
                 'execution_time': seconds
             }
         """
-        start_time = datetime.now()
-
-        # Generate output filename with timestamp
+        # Monotonic clock for elapsed time (cheaper than datetime.now()
+        # and immune to wall-clock adjustments); a single wall-clock read
+        # still stamps the output filenames
+        start = time.perf_counter()
+        # Second-resolution timestamps collide when concurrent URL/message
+        # workers call execute() in the same second (shared sidecar path =
+        # one worker's credit amount posted to another's thread); a uuid
+        # suffix makes every call's temp/summary/sidecar paths unique
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        run_id = uuid.uuid4().hex[:8]
         asid_str = f"_{asid}" if asid else ""
-        temp_notebook_path = self.output_dir / f"temp_{timestamp}{asid_str}.ipynb"
-        summary_json_path = self.output_dir / f"summary_{timestamp}{asid_str}.json"
+        temp_notebook_path = self.output_dir / f"temp_{timestamp}_{run_id}{asid_str}.ipynb"
+        summary_json_path = self.output_dir / f"summary_{timestamp}_{run_id}{asid_str}.json"
 
         logger.info(f"Executing notebook with parameters")
         logger.info(f"Summary will be saved to: {summary_json_path}")
 
+        # The notebook's final cell writes {'credit_amount': ...} here
+        # (documented contract), making extraction O(1) instead of a
+        # heuristic scan over every cell output
+        credit_out_path = temp_notebook_path.with_suffix('.json')
+
         try:
-            # Execute notebook with papermill (temporarily save full notebook)
+            # Execute notebook on the warm kernel, keeping the result in memory
             # The notebook expects a parameter called 'looker' (not 'sql_query')
-            pm.execute_notebook(
-                input_path=str(self.notebook_path),
-                output_path=str(temp_notebook_path),
+            nb = self._execute_notebook(
                 parameters={
-                    'looker': looker_query  # Parameter name from interview answers
+                    'looker': looker_query,  # Parameter name from interview answers
+                    'credit_out': str(credit_out_path)
                 },
-                kernel_name='python3'  # Adjust if using different kernel
+                output_path=temp_notebook_path
             )
 
-            # Extract summary info from executed notebook
-            summary_data = self._extract_summary_info(temp_notebook_path)
+            # Prefer the sidecar the notebook wrote; fall back to output
+            # scraping only if it's missing (e.g. older notebook revision)
+            credit_amount = self._read_credit_sidecar(credit_out_path)
+
+            # Extract summary info from the executed notebook (no disk round-trip)
+            summary_data = self._extract_summary_info(nb, temp_notebook_path, credit_amount)
             credit_amount = summary_data['credit_amount']
 
-            # Save summary as JSON locally
-            with open(summary_json_path, 'w', encoding='utf-8') as f:
-                json.dump(summary_data, f, indent=2, default=str)
+            # Save summary as JSON locally (orjson serializes in one shot
+            # when available; default=str matches the stdlib fallback)
+            if orjson is not None:
+                with open(summary_json_path, 'wb') as f:
+                    f.write(orjson.dumps(summary_data, option=orjson.OPT_INDENT_2,
+                                         default=str))
+            else:
+                with open(summary_json_path, 'w', encoding='utf-8') as f:
+                    json.dump(summary_data, f, indent=2, default=str)
 
             # Upload to S3 if enabled
             s3_path = None
@@ -104,12 +301,14 @@ class NotebookExecutor:
                 else:
                     logger.warning("Failed to upload summary to S3, only local copy available")
 
-            # Delete the full notebook to save space
+            # The papermill fallback writes the full notebook; delete it to save space
             if temp_notebook_path.exists():
                 temp_notebook_path.unlink()
                 logger.info(f"Deleted temporary full notebook: {temp_notebook_path}")
+            if credit_out_path.exists():
+                credit_out_path.unlink()
 
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start
 
             logger.info(f"Notebook executed successfully in {execution_time:.2f}s")
             logger.info(f"Summary saved to: {summary_json_path}")
@@ -127,12 +326,15 @@ class NotebookExecutor:
             }
 
         except Exception as e:
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = time.perf_counter() - start
             logger.error(f"Notebook execution failed after {execution_time:.2f}s: {e}")
 
-            # Clean up temporary notebook if it exists
+            # Keep the failed notebook on disk for debugging; only the
+            # sidecar (if partially written) is cleaned up
             if temp_notebook_path.exists():
-                temp_notebook_path.unlink()
+                logger.info(f"Failed notebook retained for debugging: {temp_notebook_path}")
+            if credit_out_path.exists():
+                credit_out_path.unlink()
 
             return {
                 'success': False,
@@ -142,79 +344,103 @@ class NotebookExecutor:
                 'execution_time': execution_time
             }
 
-    def _extract_credit_amount(self, notebook_path: Path) -> Optional[float]:
+    @staticmethod
+    def _read_credit_sidecar(credit_out_path: Path) -> Optional[float]:
         """
-        Extract credit_amount variable from executed notebook
+        Read the credit_amount sidecar written by the notebook's final cell
+
+        Args:
+            credit_out_path: Path the notebook was told to write to via the
+                             'credit_out' parameter
+
+        Returns:
+            credit_amount if the sidecar exists and parses, None otherwise
+        """
+        if not credit_out_path.exists():
+            return None
+        try:
+            with open(credit_out_path, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            return float(data['credit_amount'])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not parse credit sidecar {credit_out_path}: {e}")
+            return None
+
+    @staticmethod
+    def _read_notebook(notebook_path: Path):
+        """
+        Read an executed notebook, using orjson for the JSON parse when
+        available (2-3x faster than the stdlib parser nbformat uses)
 
         Args:
             notebook_path: Path to executed notebook
 
+        Returns:
+            NotebookNode for the notebook
+        """
+        with open(notebook_path, 'rb') as f:
+            raw = f.read()
+
+        if orjson is not None:
+            # Executed notebooks are v4 already and the extraction helpers
+            # treat cells as plain dicts, so skip both the stdlib json parse
+            # and the NotebookNode materialization (from_dict walks and wraps
+            # every cell/output, a real cost on notebooks with image blobs)
+            return orjson.loads(raw)
+        return nbformat.reads(raw.decode('utf-8'), as_version=4)
+
+    def _extract_credit_amount(self, nb) -> Optional[float]:
+        """
+        Extract credit_amount variable from executed notebook
+
+        Args:
+            nb: Executed NotebookNode
+
         Returns:
             credit_amount value if found, None otherwise
         """
         try:
-            # Read the executed notebook
-            with open(notebook_path, 'r', encoding='utf-8') as f:
-                nb = nbformat.read(f, as_version=4)
-
-            # Search through cells for credit_amount variable
-            for cell in nb.cells:
-                if cell.cell_type == 'code':
-                    # Check cell outputs
-                    outputs = cell.get('outputs', [])
-                    for output in outputs:
-                        # Check display_data and execute_result
-                        if output.get('output_type') in ['display_data', 'execute_result']:
-                            data = output.get('data', {})
-                            text = data.get('text/plain', '')
-
-                            # Look for credit_amount in the output
-                            if 'credit_amount' in cell.get('source', ''):
-                                # Try to parse the value
-                                try:
-                                    # Remove quotes and parse as float
-                                    value_str = text.strip().strip("'\"")
-                                    credit_amount = float(value_str)
-                                    return credit_amount
-                                except (ValueError, AttributeError):
-                                    pass
-
-                    # Also check if the cell explicitly assigns credit_amount
-                    source = cell.get('source', '')
-                    if 'credit_amount =' in source or 'credit_amount=' in source:
-                        # Try to find the value in outputs
-                        for output in outputs:
-                            if output.get('output_type') == 'stream':
-                                text = output.get('text', '')
-                                # Try to parse any number from the output
-                                import re
-                                numbers = re.findall(r'\$?(\d+\.?\d*)', text)
-                                if numbers:
-                                    try:
-                                        return float(numbers[0])
-                                    except ValueError:
-                                        pass
-
-            # If not found in outputs, try to find in the last cell
-            # Sometimes the final value is just displayed without explicit output
-            if nb.cells:
-                last_cell = nb.cells[-1]
-                if last_cell.cell_type == 'code':
-                    outputs = last_cell.get('outputs', [])
-                    for output in outputs:
-                        if output.get('output_type') in ['display_data', 'execute_result']:
-                            data = output.get('data', {})
-                            text = data.get('text/plain', '').strip()
-
-                            # Try to parse as float
+            # The credit_amount assignment lives in the notebook's final few
+            # cells, so scan bottom-up and return on the first hit - O(1)
+            # expected cell visits instead of traversing the whole notebook.
+            # The first code cell visited (the notebook's last) also gets the
+            # lenient displayed-value parse that used to be a second pass.
+            is_last_code_cell = True
+            for cell in reversed(nb['cells']):
+                if cell.get('cell_type') != 'code':
+                    continue
+
+                outputs = cell.get('outputs', [])
+                source = cell.get('source', '')
+
+                for output in outputs:
+                    output_type = output.get('output_type')
+                    if output_type in ['display_data', 'execute_result']:
+                        data = output.get('data', {})
+                        text = data.get('text/plain', '')
+
+                        # Parse the displayed value when the cell mentions
+                        # credit_amount, or unconditionally for the
+                        # notebook's final code cell (the value is often
+                        # just displayed there without an assignment)
+                        if 'credit_amount' in source or is_last_code_cell:
+                            value = _parse_money(text)
+                            if value is not None:
+                                return value
+
+                    elif (output_type == 'stream'
+                            and ('credit_amount =' in source or 'credit_amount=' in source)):
+                        # Try to parse any number from the printed output
+                        numbers = _CREDIT_RE.findall(output.get('text', ''))
+                        if numbers:
                             try:
-                                # Handle potential $ signs and commas
-                                cleaned = text.replace('$', '').replace(',', '').strip("'\"")
-                                credit_amount = float(cleaned)
-                                return credit_amount
-                            except (ValueError, AttributeError):
+                                return float(numbers[0])
+                            except ValueError:
                                 pass
 
+                is_last_code_cell = False
+
             logger.warning("Could not extract credit_amount from notebook output")
             return None
 
@@ -222,42 +448,57 @@ class NotebookExecutor:
             logger.error(f"Error extracting credit_amount: {e}")
             return None
 
-    def _extract_summary_info(self, notebook_path: Path) -> Dict[str, Any]:
+    def _extract_summary_info(self, nb, notebook_path: Path,
+                              credit_amount: Optional[float] = None) -> Dict[str, Any]:
         """
         Extract only Summary Info section from executed notebook
 
         Args:
-            notebook_path: Path to executed notebook
+            nb: Executed NotebookNode
+            notebook_path: Path the notebook would be written to (recorded in
+                           the summary for traceability)
+            credit_amount: Known credit amount (from the sidecar); when set,
+                           the per-cell credit scraping is skipped entirely
 
         Returns:
             Dict containing summary data and credit amount
         """
         try:
-            with open(notebook_path, 'r', encoding='utf-8') as f:
-                nb = nbformat.read(f, as_version=4)
-
             summary_data = {
                 'extracted_at': datetime.now().isoformat(),
                 'notebook_path': str(notebook_path),
                 'summary_outputs': {},
-                'credit_amount': None
+                'credit_amount': credit_amount
             }
 
-            # Find "Summary Info" section
+            # Drop non-text MIME bundles up front: extraction only ever reads
+            # text/plain, and a single matplotlib cell can pin a multi-MB
+            # base64 png in memory for the whole scan otherwise
+            for cell in nb['cells']:
+                for output in cell.get('outputs') or []:
+                    data = output.get('data')
+                    if data:
+                        for key in list(data.keys()):
+                            if key != 'text/plain':
+                                del data[key]
+
+            # Find "Summary Info" section. Cells are accessed as plain
+            # dicts so this works on both NotebookNode and raw parsed JSON,
+            # and output bodies are only touched once the section is found.
             in_summary = False
-            for idx, cell in enumerate(nb.cells):
+            for idx, cell in enumerate(nb['cells']):
                 # Look for the "## Summary Info" markdown header
-                if cell.cell_type == 'markdown' and 'Summary Info' in cell.get('source', ''):
+                if cell.get('cell_type') == 'markdown' and 'Summary Info' in cell.get('source', ''):
                     in_summary = True
                     logger.info("Found Summary Info section in notebook")
                     continue
 
                 # Process code cells in summary section
-                if in_summary and cell.cell_type == 'code':
+                if in_summary and cell.get('cell_type') == 'code':
                     cell_source = cell.get('source', '')
 
                     # Extract key summary cells
-                    if any(keyword in cell_source for keyword in ['output_df', 'credit_amount', 'asid_df', 'blocking']):
+                    if _SUMMARY_KEYWORDS_RE.search(cell_source):
                         cell_id = f"cell_{idx}"
 
                         # Get cell outputs (text, data, etc.)
@@ -270,7 +511,9 @@ class NotebookExecutor:
                         }
 
                         # Check if this cell calculates credit_amount
-                        if 'credit_amount' in cell_source and '=' in cell_source:
+                        # (only when the sidecar didn't already provide it)
+                        if (summary_data['credit_amount'] is None
+                                and 'credit_amount' in cell_source and '=' in cell_source):
                             # Try to extract the credit amount value
                             credit = self._extract_credit_from_cell(cell)
                             if credit is not None:
@@ -279,7 +522,7 @@ class NotebookExecutor:
 
             # If we didn't find credit_amount in summary section, try the full notebook
             if summary_data['credit_amount'] is None:
-                summary_data['credit_amount'] = self._extract_credit_amount(notebook_path)
+                summary_data['credit_amount'] = self._extract_credit_amount(nb)
 
             return summary_data
 
@@ -289,7 +532,7 @@ class NotebookExecutor:
                 'extracted_at': datetime.now().isoformat(),
                 'notebook_path': str(notebook_path),
                 'summary_outputs': {},
-                'credit_amount': None,
+                'credit_amount': credit_amount,
                 'error': str(e)
             }
 
@@ -350,19 +593,9 @@ class NotebookExecutor:
             for output in outputs:
                 if output.get('output_type') in ['execute_result', 'display_data']:
                     data = output.get('data', {})
-                    text = data.get('text/plain', '')
-
-                    if isinstance(text, list):
-                        text = ''.join(text)
-
-                    # Try to parse as float
-                    # Handle formats like: '$4,948.80', '4948.80', etc.
-                    cleaned = str(text).strip().replace('$', '').replace(',', '').replace("'", '').replace('"', '')
-
-                    try:
-                        return float(cleaned)
-                    except ValueError:
-                        continue
+                    value = _parse_money(data.get('text/plain', ''))
+                    if value is not None:
+                        return value
 
         except Exception as e:
             logger.debug(f"Could not extract credit from cell: {e}")
@@ -383,18 +616,7 @@ class NotebookExecutor:
         Returns:
             True if query appears to be for Verify, False otherwise (PSMS)
         """
-        sql_lower = sql_query.lower()
-
-        # Look for "authy" keyword (case insensitive)
-        if 'authy' not in sql_lower:
-            return False
-
-        # Verify it's in context of product or friendly_name columns
-        # This helps ensure we're detecting Verify product correctly
-        has_product_column = 'billable_item_metadata_alex.product' in sql_lower
-        has_friendly_name_column = 'billable_items.friendly_name' in sql_lower
-
-        return has_product_column or has_friendly_name_column
+        return _is_verify_query(sql_query)
 
 
 # Example usage
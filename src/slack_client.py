@@ -3,7 +3,9 @@ Slack Client
 Handles Slack API interactions for monitoring messages and posting replies
 """
 
+import json
 import re
+import time
 import logging
 from typing import List, Optional, Dict
 from slack_sdk import WebClient
@@ -12,6 +14,19 @@ from .config import Config
 
 logger = logging.getLogger(__name__)
 
+# Slack link format: <https://url.com|display text>
+# Compiled once at import; extraction runs per message on every poll
+_SLACK_LINK_RE = re.compile(r'<(https?://[^|>]+)(?:\|[^>]+)?>')
+
+# Case-insensitive domain check without allocating a lowercased URL copy,
+# anchored to the host portion so a path merely containing "looker.com"
+# doesn't false-positive
+_LOOKER_RE = re.compile(r'://[^/]*looker\.com', re.IGNORECASE)
+
+# How long the cached bot identity / channel listing stays valid (seconds);
+# the identity never changes and the channel set changes rarely
+SLACK_CACHE_TTL = 3600
+
 
 class SlackClient:
     """Client for interacting with Slack API"""
@@ -27,6 +42,42 @@ class SlackClient:
         self.client = WebClient(token=self.token)
         self.bot_user_id = None
 
+        # name -> id for every channel seen while paginating; one
+        # conversations.list walk serves all lookups for the client lifetime
+        self._channel_cache: Dict[str, str] = {}
+
+        # Warm both from the previous run's disk cache (bounded by
+        # SLACK_CACHE_TTL) so a fresh pod can skip auth_test and the
+        # conversations.list walk entirely
+        self._cache_file = Config.STATE_FILE.parent / 'slack_cache.json'
+        self._load_cache()
+
+    def _load_cache(self):
+        """Load cached bot identity and channel listing if still fresh"""
+        try:
+            if self._cache_file.exists():
+                with open(self._cache_file, 'r') as f:
+                    cached = json.load(f)
+                if time.time() - cached.get('fetched_at', 0) < SLACK_CACHE_TTL:
+                    self.bot_user_id = cached.get('bot_user_id')
+                    self._channel_cache.update(cached.get('channels', {}))
+                    logger.info("Loaded Slack identity/channel cache from disk")
+        except Exception as e:
+            logger.debug(f"Could not load Slack cache: {e}")
+
+    def _save_cache(self):
+        """Persist bot identity and channel listing for the next run (best effort)"""
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self._cache_file, 'w') as f:
+                json.dump({
+                    'bot_user_id': self.bot_user_id,
+                    'channels': self._channel_cache,
+                    'fetched_at': time.time()
+                }, f)
+        except Exception as e:
+            logger.debug(f"Could not save Slack cache: {e}")
+
     def test_connection(self) -> bool:
         """
         Test Slack API connection and get bot user ID
@@ -34,9 +85,16 @@ class SlackClient:
         Returns:
             bool: True if connection successful, False otherwise
         """
+        # A fresh cached identity means the token worked within the TTL;
+        # skip the auth_test round-trip
+        if self.bot_user_id:
+            logger.info("Using cached Slack bot identity")
+            return True
+
         try:
             response = self.client.auth_test()
             self.bot_user_id = response['user_id']
+            self._save_cache()
             logger.info(f"Successfully connected to Slack as {response['user']}")
             return True
 
@@ -44,12 +102,17 @@ class SlackClient:
             logger.error(f"Slack connection failed: {e}")
             return False
 
-    def get_channel_id(self, channel_name: str) -> Optional[str]:
+    def get_channel_id(self, channel_name: str, refresh: bool = False) -> Optional[str]:
         """
         Get channel ID from channel name
 
+        The first lookup paginates conversations.list once (large pages,
+        following next_cursor) and caches every channel seen, so later
+        lookups - and retries for other channels - cost no API calls.
+
         Args:
             channel_name: Channel name (with or without #)
+            refresh: Force a re-fetch of the channel list (cache invalidation)
 
         Returns:
             Channel ID if found, None otherwise
@@ -57,13 +120,34 @@ class SlackClient:
         # Remove # if present
         channel_name = channel_name.lstrip('#')
 
-        try:
-            response = self.client.conversations_list(types='public_channel,private_channel')
-            channels = response['channels']
+        if refresh:
+            self._channel_cache.clear()
 
-            for channel in channels:
-                if channel['name'] == channel_name:
-                    return channel['id']
+        if channel_name in self._channel_cache:
+            return self._channel_cache[channel_name]
+
+        try:
+            cursor = None
+            while True:
+                response = self.client.conversations_list(
+                    types='public_channel,private_channel',
+                    limit=1000,
+                    cursor=cursor
+                )
+                for channel in response['channels']:
+                    self._channel_cache[channel['name']] = channel['id']
+
+                cursor = response.get('response_metadata', {}).get('next_cursor')
+                if not cursor:
+                    break
+                # Stop paginating early once the requested channel is seen
+                if channel_name in self._channel_cache:
+                    break
+
+            self._save_cache()
+
+            if channel_name in self._channel_cache:
+                return self._channel_cache[channel_name]
 
             logger.warning(f"Channel '{channel_name}' not found")
             return None
@@ -72,7 +156,7 @@ class SlackClient:
             logger.error(f"Error fetching channel list: {e}")
             return None
 
-    def get_recent_messages(self, channel_id: str, limit: int = 100) -> List[Dict]:
+    def get_recent_messages(self, channel_id: str, limit: int = 100) -> Optional[List[Dict]]:
         """
         Get recent messages from a channel
 
@@ -81,7 +165,10 @@ class SlackClient:
             limit: Maximum number of messages to retrieve
 
         Returns:
-            List of message dictionaries
+            List of message dictionaries, or None if the fetch failed (e.g.
+            a stale channel ID) - distinct from an empty channel, so callers
+            can invalidate caches and retry instead of treating an error as
+            "no new messages"
         """
         try:
             response = self.client.conversations_history(
@@ -95,7 +182,7 @@ class SlackClient:
 
         except SlackApiError as e:
             logger.error(f"Error fetching messages: {e}")
-            return []
+            return None
 
     def extract_looker_urls(self, message_text: str) -> List[str]:
         """
@@ -114,14 +201,12 @@ class SlackClient:
         """
         looker_urls = []
 
-        # Slack link format: <https://url.com|display text>
         # We need to extract the URL part before the |
-        link_pattern = r'<(https?://[^|>]+)(?:\|[^>]+)?>'
-        matches = re.findall(link_pattern, message_text)
+        matches = _SLACK_LINK_RE.findall(message_text)
 
         for url in matches:
             # Check if it's a Looker URL
-            if 'looker.com' in url.lower():
+            if _LOOKER_RE.search(url):
                 looker_urls.append(url)
                 logger.info(f"Found Looker URL: {url}")
 
@@ -223,6 +308,24 @@ class SlackClient:
             'has_looker_link': len(looker_urls) > 0
         }
 
+    def parse_credit_requests(self, messages: List[Dict]) -> List[Dict]:
+        """
+        Parse a batch of messages in one pass
+
+        Hoists the attribute lookups out of the caller's loop and drops
+        non-requests (bot messages) in place, so backfills over hundreds of
+        messages don't pay per-message dispatch overhead.
+
+        Args:
+            messages: Slack message dictionaries
+
+        Returns:
+            List of parsed request dicts (same shape as parse_credit_request),
+            bot messages excluded
+        """
+        parse = self.parse_credit_request
+        return [parsed for parsed in map(parse, messages) if parsed]
+
 
 # Example usage
 if __name__ == "__main__":
@@ -241,8 +344,11 @@ if __name__ == "__main__":
         if channel_id:
             print(f"✅ Found channel #{channel_name}: {channel_id}")
 
-            # Get recent messages
+            # Get recent messages (None means the fetch itself failed)
             messages = client.get_recent_messages(channel_id, limit=10)
+            if messages is None:
+                print("❌ Failed to fetch messages")
+                messages = []
             print(f"\n📨 Retrieved {len(messages)} recent messages")
 
             # Parse each message
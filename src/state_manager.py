@@ -4,15 +4,91 @@ Tracks processed messages to avoid duplicate processing
 Supports both local file storage and S3 backend
 """
 
+import atexit
+import hashlib
 import json
 import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Set, Dict, Any
 from datetime import datetime
 from .config import Config
 
+# Prefer orjson for snapshot serialization (5-10x faster than stdlib json
+# on dict-heavy state); fall back to stdlib otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# How many processed-message timestamps the snapshot retains; older entries
+# rotate out automatically (the bot only ever looks back ~100 messages)
+_MAX_RECENT = 1000
+
+# One place to pick the fast path: every load/dump in this module goes
+# through these so no call site needs its own orjson guard
+if orjson is not None:
+    _loads = orjson.loads
+    _dumps_bytes = orjson.dumps
+
+    def _dumps_str(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    _loads = json.loads
+
+    def _dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def _dumps_str(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+
+
+class _BloomFilter:
+    """
+    Compact first-line membership filter in front of the processed set
+
+    A few cache-line bit reads reject the common case (a brand-new message)
+    before the set is consulted; no false negatives, ~1% false positives
+    fall through to the authoritative set. Sized with the standard
+    m = -n*ln(eps)/ln(2)^2 formula and uses Kirsch-Mitzenmacher double
+    hashing, with both 32-bit hashes drawn from one blake2b digest so no
+    extra hashing dependency is needed.
+    """
+
+    def __init__(self, expected_items: int, error_rate: float = 0.01):
+        n = max(expected_items, 64)
+        self._m = math.ceil(-n * math.log(error_rate) / (math.log(2) ** 2))
+        self._k = max(1, round((self._m / n) * math.log(2)))
+        self._bits = bytearray((self._m + 7) // 8)
+
+    @staticmethod
+    def _hashes(item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], 'little')
+        h2 = int.from_bytes(digest[4:], 'little') | 1
+        return h1, h2
+
+    def add(self, item: str):
+        h1, h2 = self._hashes(item)
+        for i in range(self._k):
+            idx = (h1 + i * h2) % self._m
+            self._bits[idx >> 3] |= 1 << (idx & 7)
+
+    def __contains__(self, item: str) -> bool:
+        h1, h2 = self._hashes(item)
+        for i in range(self._k):
+            idx = (h1 + i * h2) % self._m
+            if not self._bits[idx >> 3] & (1 << (idx & 7)):
+                return False
+        return True
+
 
 class StateManager:
     """Manages bot state - tracks processed messages"""
@@ -28,9 +104,83 @@ class StateManager:
         self.use_s3 = Config.USE_S3_STORAGE
         self.aws_client = Config.get_aws_client() if self.use_s3 else None
 
+        # Hoisted once: these never change after startup, and instance
+        # attributes spare every save/load a pair of class-dict lookups
+        self._bucket = Config.S3_BUCKET
+        self._state_key = Config.S3_STATE_KEY
+        self._details_key = Config.S3_DETAILS_KEY
+
+        # Last-seen ETag of the S3 snapshot: lets _load_state issue a
+        # conditional GET and reuse the local cache on a 304 instead of
+        # re-downloading an unchanged blob every pod start
+        self._etag_file = self.state_file.with_suffix('.etag')
+
         # Load state from S3 or local file
         self.state = self._load_state()
 
+        # Per-message processing details live in a sidecar, loaded lazily -
+        # the hot is_processed/snapshot path only ever needs the timestamps,
+        # so the bulky metadata stays off the wire until something (stats,
+        # cleanup, crash replay) actually asks for it
+        self._details_file = self.state_file.with_suffix('.details.json')
+        self._details = None
+        self._details_dirty = False
+
+        # Migrate details embedded in older snapshots into the sidecar
+        legacy_details = self.state.pop('processing_details', None)
+        if legacy_details:
+            self._get_details().update(legacy_details)
+            self._details_dirty = True
+
+        # O(1) membership checks instead of scanning the processed list
+        # once per Slack message
+        self._processed_set = set(self.state['processed_messages'])
+
+        # Monotonic lifetime counter kept as a plain int; it's merged back
+        # into the snapshot dict only at save time, so marking a message
+        # costs an integer increment instead of a dict write
+        self._total_processed = int(self.state.get('total_processed', 0))
+
+        # Append-only JSONL log: mark_processed appends one line instead of
+        # rewriting the whole snapshot per message. The log is folded back
+        # into the snapshot on load (crash recovery) and reset whenever a
+        # full snapshot is written.
+        self._log_file = self.state_file.with_suffix('.jsonl')
+        self._replay_log()
+        self._log_fh = open(self._log_file, 'a', buffering=1 << 16)
+
+        # Bounded deque is the primary recency container: appends rotate the
+        # oldest entry out in O(1), so no periodic list-slicing cleanup. The
+        # snapshot's list is rebuilt from it at save time.
+        self._recent = deque(self.state['processed_messages'], maxlen=_MAX_RECENT)
+
+        # Bloom pre-filter in front of the set: the common case (a brand-new
+        # message) is rejected in a few bit reads; positives fall through to
+        # the authoritative set, so there are no false negatives. Built after
+        # log replay so it covers everything the set does.
+        self._bloom = self._build_bloom()
+
+        # Debounced snapshot writes: bursty save requests within the 500ms
+        # window coalesce into one flush. In-memory state is authoritative;
+        # on-disk lag is bounded by the window plus the atexit drain.
+        self._dirty = False
+        self._flush_lock = threading.Lock()
+        self._pending_flush = None
+
+        # S3 PUTs run off-thread so the processing loop never blocks on the
+        # upload round-trip; only the latest snapshot matters, so a newer
+        # submit cancels a still-queued older one
+        self._s3_executor = ThreadPoolExecutor(max_workers=2) if self.use_s3 else None
+        self._s3_future = None
+
+        # Digest of the last successfully uploaded state (timestamp field
+        # excluded): an idle poll cycle that only bumps the heartbeat skips
+        # the S3 PUT entirely. Persisted so the skip works across pods.
+        self._hash_file = self.state_file.with_suffix('.uphash')
+        self._last_uploaded_hash = self._load_upload_hash()
+
+        atexit.register(self.flush)
+
     def _load_state(self) -> Dict[str, Any]:
         """
         Load state from S3 or local file
@@ -41,18 +191,30 @@ class StateManager:
         # Try S3 first if enabled
         if self.use_s3 and self.aws_client:
             try:
-                content = self.aws_client.read_from_s3(
-                    bucket=Config.S3_BUCKET,
-                    key=Config.S3_STATE_KEY
+                # Only send If-None-Match when there is a local copy to fall
+                # back on - a 304 with no cache would leave us empty-handed
+                etag = None
+                if self.state_file.exists() and self._etag_file.exists():
+                    etag = self._etag_file.read_text().strip() or None
+
+                content, new_etag = self.aws_client.read_from_s3_if_changed(
+                    bucket=self._bucket,
+                    key=self._state_key,
+                    etag=etag
                 )
                 if content:
-                    state = json.loads(content)
-                    logger.info(f"Loaded state from S3: s3://{Config.S3_BUCKET}/{Config.S3_STATE_KEY}")
+                    state = _loads(content)
+                    logger.info(f"Loaded state from S3: s3://{self._bucket}/{self._state_key}")
 
                     # Also save to local file as cache
                     self._save_to_local_file(state)
+                    if new_etag:
+                        self._save_etag(new_etag)
 
                     return state
+                elif etag and new_etag == etag:
+                    # 304: the local cache is current; load it below
+                    logger.info("S3 state unchanged, using local cache")
                 else:
                     logger.info("No state file in S3, checking local cache")
             except Exception as e:
@@ -61,8 +223,8 @@ class StateManager:
         # Fall back to local file
         if self.state_file.exists():
             try:
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
+                with open(self.state_file, 'rb') as f:
+                    state = _loads(f.read())
                 logger.info(f"Loaded state from local file: {self.state_file}")
                 return state
             except Exception as e:
@@ -81,37 +243,263 @@ class StateManager:
             'created_at': datetime.now().isoformat()
         }
 
-    def _save_to_local_file(self, state: Dict = None):
-        """Save state to local file"""
-        state_to_save = state or self.state
+    def _get_details(self) -> Dict[str, Any]:
+        """
+        Load the processing-details sidecar on first access
+
+        Kept out of the main snapshot so every load/save of the hot state
+        moves only timestamps; the details blob is read at most once per
+        process and only when something actually consults it.
+        """
+        if self._details is None:
+            details = None
+            if self.use_s3 and self.aws_client:
+                try:
+                    details = self.aws_client.read_json_from_s3(
+                        bucket=self._bucket,
+                        key=self._details_key
+                    )
+                except Exception as e:
+                    logger.warning(f"Error loading details from S3: {e}")
+            if details is None and self._details_file.exists():
+                try:
+                    with open(self._details_file, 'rb') as f:
+                        details = _loads(f.read())
+                except Exception as e:
+                    logger.warning(f"Error loading local details file: {e}")
+            self._details = details or {}
+        return self._details
+
+    def _save_details(self):
+        """Persist the details sidecar if it changed (local + background S3)"""
+        if not self._details_dirty or self._details is None:
+            return
+        self._details_dirty = False
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state_to_save, f, indent=2)
+            tmp_file = self._details_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                f.write(_dumps_str(self._details))
+            os.replace(tmp_file, self._details_file)
+        except Exception as e:
+            logger.error(f"Error saving local details file: {e}")
+        if self.use_s3 and self.aws_client:
+            # Fire-and-forget on the upload pool; the JSONL log still covers
+            # crash recovery, so details durability is best effort
+            self._s3_executor.submit(
+                self.aws_client.write_json_to_s3,
+                self._bucket, self._details_key, self._details, compress=True
+            )
+
+    def _build_bloom(self) -> _BloomFilter:
+        """Build the Bloom pre-filter over the current processed set"""
+        # Size for growth headroom so the error rate holds as entries accrue
+        bloom = _BloomFilter(expected_items=max(len(self._processed_set) * 2, 2048))
+        for ts in self._processed_set:
+            bloom.add(ts)
+        return bloom
+
+    def _replay_log(self):
+        """
+        Fold append-log entries into the loaded state
+
+        Covers messages marked after the last full snapshot (e.g. the pod
+        died mid-run): their log lines are merged so they aren't reprocessed.
+        """
+        if not self._log_file.exists():
+            return
+        try:
+            with open(self._log_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = _loads(line)
+                    ts = entry.get('ts')
+                    if ts and ts not in self._processed_set:
+                        self._processed_set.add(ts)
+                        self.state['processed_messages'].append(ts)
+                        self._total_processed += 1
+                        if entry.get('meta'):
+                            self._get_details()[ts] = entry['meta']
+                            self._details_dirty = True
+        except Exception as e:
+            logger.warning(f"Error replaying state log: {e}")
+
+    def _reset_log(self):
+        """Reset the append log after its entries are snapshotted"""
+        try:
+            self._log_fh.truncate(0)
+            self._log_fh.seek(0)
+        except Exception as e:
+            logger.debug(f"Could not reset state log: {e}")
+
+    def _save_to_local_file(self, state: Dict = None, data: bytes = None):
+        """
+        Save state to local file atomically
+
+        Serializes to one in-memory blob (compact - indentation roughly
+        doubles the byte count for a file only machines read back), writes
+        it to a sibling tmp file in a single call, then os.replace()s it
+        over the real file - a crash mid-write can no longer corrupt the
+        only copy, and the data hits the kernel in one write() instead of
+        many small ones. Callers that already serialized (to share one
+        buffer with the S3 upload) pass data directly.
+        """
+        try:
+            if data is None:
+                data = _dumps_bytes(state or self.state)
+
+            tmp_file = self.state_file.with_suffix('.tmp')
+            try:
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+                    # fsync before the rename so a power loss can't leave an
+                    # empty file behind a completed replace
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.state_file)
+            except Exception:
+                tmp_file.unlink(missing_ok=True)
+                raise
             logger.debug(f"State saved to local file: {self.state_file}")
         except Exception as e:
             logger.error(f"Error saving local state: {e}")
 
+    def _schedule_save(self):
+        """
+        Request a snapshot write, coalescing bursts behind a 500ms timer
+
+        Back-to-back calls mark the state dirty and share a single pending
+        flush instead of each rewriting the file.
+        """
+        with self._flush_lock:
+            self._dirty = True
+            if self._pending_flush is None or not self._pending_flush.is_alive():
+                self._pending_flush = threading.Timer(0.5, self.flush)
+                self._pending_flush.daemon = True
+                self._pending_flush.start()
+
+    def flush(self):
+        """Write the snapshot immediately if there are unsaved changes"""
+        with self._flush_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        self._save_state()
+        self._drain_s3()
+
+    def __enter__(self):
+        """Support batching a processing loop: flushes once on exit"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
     def _save_state(self):
         """Save current state to S3 and/or local file"""
+        # Materialize the bounded deque and lifetime counter into the
+        # snapshot's serializable form
+        self.state['processed_messages'] = list(self._recent)
+        self.state['total_processed'] = self._total_processed
+
+        # Serialize exactly once on the caller's thread; the same immutable
+        # bytes back both the local write and the S3 upload, so the upload
+        # sees a consistent snapshot even if state mutates while in flight
+        try:
+            data = _dumps_bytes(self.state)
+        except Exception as e:
+            logger.error(f"Error serializing state: {e}")
+            return
+
         # Always save to local file (as cache/backup)
-        self._save_to_local_file()
+        self._save_to_local_file(data=data)
+
+        # Sidecar only rewrites when details actually changed
+        self._save_details()
 
-        # If S3 enabled, also save to S3
+        # If S3 enabled, also save to S3 - off-thread, so the caller isn't
+        # blocked on the PUT round-trip
         if self.use_s3 and self.aws_client:
+            content_hash = self._content_hash()
+            if content_hash == self._last_uploaded_hash:
+                logger.info("State unchanged since last upload, skipping S3 PUT")
+                return
+            # Coalesce: a still-queued older upload is superseded by this one
+            if self._s3_future is not None:
+                self._s3_future.cancel()
+            self._s3_future = self._s3_executor.submit(
+                self._upload_state_blocking, data, content_hash)
+
+    def _upload_state_blocking(self, content: bytes, content_hash: str):
+        """Upload one serialized snapshot to S3 (runs on the executor)"""
+        try:
+            # gzip on the wire: repeated ts prefixes and field names compress
+            # ~5-10x, and both S3 read paths already sniff the gzip magic
+            success = self.aws_client.write_to_s3(
+                bucket=self._bucket,
+                key=self._state_key,
+                content=content,
+                content_type='application/json',
+                compress=True
+            )
+            if success:
+                logger.info(f"State saved to S3: s3://{self._bucket}/{self._state_key}")
+                self._last_uploaded_hash = content_hash
+                try:
+                    self._hash_file.write_text(content_hash)
+                except OSError as e:
+                    logger.debug(f"Could not save upload hash: {e}")
+                # One HEAD (off the hot path - we're already on the upload
+                # thread) records the new ETag so the next pod's conditional
+                # GET can 304 instead of re-downloading what we just wrote
+                etag = self.aws_client.get_etag(self._bucket, self._state_key)
+                if etag:
+                    self._save_etag(etag)
+            else:
+                logger.warning("Failed to save state to S3")
+        except Exception as e:
+            logger.error(f"Error saving state to S3: {e}")
+
+    def _save_etag(self, etag: str):
+        """Persist the last-seen S3 snapshot ETag (best effort)"""
+        try:
+            self._etag_file.write_text(etag)
+        except OSError as e:
+            logger.debug(f"Could not save state ETag: {e}")
+
+    def _load_upload_hash(self) -> str:
+        """Load the digest of the last uploaded state, if recorded"""
+        try:
+            if self._hash_file.exists():
+                return self._hash_file.read_text().strip()
+        except OSError:
+            pass
+        return ''
+
+    def _content_hash(self) -> str:
+        """
+        Digest the state's meaningful content
+
+        last_check_timestamp is excluded: it changes every cycle even when
+        nothing was processed, and an unchanged digest is what lets the
+        heartbeat-only save skip its S3 upload.
+        """
+        meaningful = {k: v for k, v in self.state.items() if k != 'last_check_timestamp'}
+        if orjson is not None:
+            payload = orjson.dumps(meaningful, option=orjson.OPT_SORT_KEYS)
+        else:
+            payload = json.dumps(meaningful, sort_keys=True).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def _drain_s3(self):
+        """Wait for the last in-flight S3 upload so errors surface before exit"""
+        future = self._s3_future
+        if future is not None:
             try:
-                content = json.dumps(self.state, indent=2)
-                success = self.aws_client.write_to_s3(
-                    bucket=Config.S3_BUCKET,
-                    key=Config.S3_STATE_KEY,
-                    content=content,
-                    content_type='application/json'
-                )
-                if success:
-                    logger.info(f"State saved to S3: s3://{Config.S3_BUCKET}/{Config.S3_STATE_KEY}")
-                else:
-                    logger.warning("Failed to save state to S3")
+                future.result(timeout=30)
             except Exception as e:
-                logger.error(f"Error saving state to S3: {e}")
+                logger.error(f"Background S3 state upload failed: {e}")
 
     def is_processed(self, message_ts: str) -> bool:
         """
@@ -123,7 +511,11 @@ class StateManager:
         Returns:
             True if message has been processed, False otherwise
         """
-        return message_ts in self.state['processed_messages']
+        # Bloom miss is definitive (no false negatives); only a positive
+        # needs the authoritative set consulted
+        if message_ts not in self._bloom:
+            return False
+        return message_ts in self._processed_set
 
     def mark_processed(self, message_ts: str, metadata: Dict = None):
         """
@@ -133,26 +525,53 @@ class StateManager:
             message_ts: Slack message timestamp
             metadata: Optional metadata about the processing
         """
-        if not self.is_processed(message_ts):
-            self.state['processed_messages'].append(message_ts)
-            self.state['total_processed'] += 1
-
-            # Store metadata if provided
+        # Check-and-add in one set operation: add() is idempotent, so a
+        # stable length means the message was already known - no separate
+        # is_processed probe hashing the same key twice
+        before = len(self._processed_set)
+        self._processed_set.add(message_ts)
+        if len(self._processed_set) != before:
+            self._bloom.add(message_ts)
+            self._recent.append(message_ts)
+            self._total_processed += 1
+
+            # Store metadata if provided. processed_at is a raw epoch float:
+            # no datetime object or strftime per mark, and a third the bytes
+            # of an ISO string on disk
+            details = None
             if metadata:
-                if 'processing_details' not in self.state:
-                    self.state['processing_details'] = {}
-                self.state['processing_details'][message_ts] = {
+                details = {
                     **metadata,
-                    'processed_at': datetime.now().isoformat()
+                    'processed_at': time.time()
                 }
+                self._get_details()[message_ts] = details
+                self._details_dirty = True
+
+            # O(1) durability: one appended line instead of rewriting the
+            # whole snapshot; the snapshot catches up at flush/end of run
+            try:
+                self._log_fh.write(_dumps_str({'ts': message_ts, 'meta': details}) + '\n')
+                self._log_fh.flush()
+            except Exception as e:
+                logger.error(f"Error appending to state log: {e}")
+
+            # Snapshot is now behind; flush()/atexit/update_last_check will
+            # write it once per batch rather than once per message
+            self._dirty = True
 
-            self._save_state()
             logger.info(f"Marked message {message_ts} as processed")
 
     def update_last_check(self):
-        """Update the last check timestamp"""
+        """Update the last check timestamp and snapshot the full state"""
         self.state['last_check_timestamp'] = datetime.now().isoformat()
+        # End of run: write synchronously (no debounce) so the log can be
+        # reset only once the snapshot is durably on disk
+        with self._flush_lock:
+            self._dirty = False
         self._save_state()
+        self._drain_s3()
+        # The snapshot now contains everything the log recorded
+        self._reset_log()
 
     def get_unprocessed_messages(self, messages: list) -> list:
         """
@@ -164,10 +583,10 @@ class StateManager:
         Returns:
             List of unprocessed messages
         """
-        unprocessed = [
-            msg for msg in messages
-            if not self.is_processed(msg.get('ts'))
-        ]
+        # Bind the set locally so the comprehension does one O(1) membership
+        # test per message with no attribute/method dispatch
+        processed = self._processed_set
+        unprocessed = [msg for msg in messages if msg.get('ts') not in processed]
 
         logger.info(f"Found {len(unprocessed)} unprocessed messages out of {len(messages)} total")
         return unprocessed
@@ -180,36 +599,37 @@ class StateManager:
             Dictionary with stats
         """
         return {
-            'total_processed': self.state['total_processed'],
+            'total_processed': self._total_processed,
             'last_check': self.state['last_check_timestamp'],
             'created_at': self.state['created_at'],
-            'processed_count': len(self.state['processed_messages'])
+            'processed_count': len(self._recent)
         }
 
     def cleanup_old_entries(self, days_to_keep: int = 30):
         """
-        Remove old processed message entries to keep file size manageable
+        Prune index structures for entries the bounded deque rotated out
+
+        The deque's maxlen already caps retention on every append, so this
+        only needs to drop the rotated entries from the membership set, the
+        Bloom filter, and the details sidecar.
 
         Args:
-            days_to_keep: Number of days of history to keep
+            days_to_keep: Number of days of history to keep (retention is
+                          effectively bounded by entry count, not age)
         """
-        # Keep at least the last N messages
-        max_entries = 1000
-
-        if len(self.state['processed_messages']) > max_entries:
-            # Keep only the most recent entries
-            self.state['processed_messages'] = self.state['processed_messages'][-max_entries:]
+        if len(self._processed_set) > len(self._recent):
+            kept_ts = set(self._recent)
+            self._processed_set = kept_ts
+            self._bloom = self._build_bloom()
 
             # Also cleanup processing details if they exist
-            if 'processing_details' in self.state:
-                kept_ts = set(self.state['processed_messages'])
-                self.state['processing_details'] = {
-                    k: v for k, v in self.state['processing_details'].items()
-                    if k in kept_ts
-                }
+            details = self._get_details()
+            if details:
+                self._details = {k: v for k, v in details.items() if k in kept_ts}
+                self._details_dirty = True
 
-            self._save_state()
-            logger.info(f"Cleaned up old state entries, keeping {max_entries} most recent")
+            self._schedule_save()
+            logger.info(f"Cleaned up old state entries, keeping {_MAX_RECENT} most recent")
 
 
 # Example usage